@@ -0,0 +1,46 @@
+"""
+Compare the cost of decoding a full-year dashboard response.
+
+    python benchmarks/json_decode.py [--profiles N] [--number N]
+"""
+
+import json
+import timeit
+import argparse
+
+from payload import make_payload
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--profiles", type=int, default=1)
+    parser.add_argument("--number", type=int, default=50)
+    args = parser.parse_args()
+
+    body = json.dumps(make_payload(args.profiles)).encode("utf-8")
+    print(f"payload: {len(body) / 1024:.0f} KiB, {args.profiles} profile(s)")
+
+    cases = {
+        # what aiohttp's response.json() does: decode to str, then parse
+        "str + json.loads": lambda: json.loads(body.decode("utf-8")),
+        "json.loads(bytes)": lambda: json.loads(body),
+    }
+    if orjson is not None:
+        cases["orjson.loads(bytes)"] = lambda: orjson.loads(body)
+    else:
+        print("orjson is not installed, pip install didupy[speedups]")
+
+    baseline = None
+    for name, func in cases.items():
+        best = min(timeit.repeat(func, number=args.number, repeat=5)) / args.number
+        baseline = baseline or best
+        print(f"{name:>22}: {best * 1000:8.2f} ms  ({baseline / best:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
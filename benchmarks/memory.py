@@ -0,0 +1,71 @@
+"""
+Measure the memory held by the parsed dashboards, in bytes per account.
+Every section is read once, so that the figures include the models even
+though sections are only built on first access.
+
+    python benchmarks/memory.py [--accounts N]
+"""
+
+import gc
+import os
+import sys
+import json
+import argparse
+import tracemalloc
+
+from payload import make_payload
+
+# run from a checkout, without installing the package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from didupy import DidUPClient
+from didupy.me import Me
+from didupy.dashboard import Dashboard, SECTIONS
+
+# classmates: same subjects and teachers, different grades and absences
+VARIANTS = 8
+
+
+def measure(bodies: list[bytes], accounts: int, keep_raw: bool) -> float:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    dashboards = []
+    for i in range(accounts):
+        client = DidUPClient("SC00000", f"user{i}", "password", keep_raw=keep_raw)
+        dashboard = Dashboard(client, Me(client))
+        # decode every time, like a real response would be
+        payload = json.loads(bodies[i % len(bodies)])
+        dashboard._parse(payload["data"]["dati"][0])
+        for section in SECTIONS:
+            getattr(dashboard, section)
+
+        dashboards.append(dashboard)
+
+    del payload
+
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / accounts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--accounts", type=int, default=50)
+    args = parser.parse_args()
+
+    bodies = [
+        json.dumps(make_payload(seed=i)).encode("utf-8") for i in range(VARIANTS)
+    ]
+    print(f"payload: {len(bodies[0]) / 1024:.0f} KiB, {args.accounts} accounts")
+
+    for keep_raw in (True, False):
+        per_account = measure(bodies, args.accounts, keep_raw)
+        print(f"keep_raw={keep_raw!s:>5}: {per_account / 1024:8.0f} KiB per account")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""Synthetic didUP dashboard payloads, shaped like a full school year."""
+
+import random
+from datetime import date, timedelta
+
+START = date(2023, 9, 11)
+SCHOOL_DAYS = 200
+
+
+def _day(i: int) -> str:
+    return (START + timedelta(days=i % SCHOOL_DAYS)).isoformat()
+
+
+def _subjects(n: int) -> list[dict]:
+    return [
+        {
+            "pk": f"M{i}",
+            "abbreviazione": f"MAT{i}",
+            "scrut": True,
+            "codTipo": "N",
+            "faMedia": True,
+            "materia": f"Materia {i}",
+        }
+        for i in range(n)
+    ]
+
+
+def _teachers(n: int, subjects: int) -> list[dict]:
+    return [
+        {
+            "pk": f"D{i}",
+            "desCognome": f"Cognome{i}",
+            "desNome": f"Nome{i}",
+            "desEmail": f"docente{i}@scuola.it",
+            "materie": [f"MAT{i % subjects}", f"MAT{(i + 1) % subjects}"],
+        }
+        for i in range(n)
+    ]
+
+
+def _periods() -> list[dict]:
+    return [
+        {
+            "pkPeriodo": "P1",
+            "dataInizio": "2023-09-01",
+            "datInizio": None,
+            "descrizione": "Primo quadrimestre",
+            "votoUnico": False,
+            "mediaScrutinio": 0.0,
+            "isMediaScrutinio": False,
+            "dataFine": "2024-01-31",
+            "datFine": None,
+            "codPeriodo": "Q1",
+            "isScrutinioFinale": False,
+        },
+        {
+            "pkPeriodo": "P2",
+            "dataInizio": "2024-02-01",
+            "datInizio": None,
+            "descrizione": "Secondo quadrimestre",
+            "votoUnico": False,
+            "mediaScrutinio": 0.0,
+            "isMediaScrutinio": False,
+            "dataFine": "2024-06-30",
+            "datFine": None,
+            "codPeriodo": "Q2",
+            "isScrutinioFinale": True,
+        },
+    ]
+
+
+def _grade(rnd: random.Random, i: int, subjects: int, teachers: int) -> dict:
+    m = rnd.randrange(subjects)
+    value = rnd.choice([4, 5, 5.5, 6, 6.5, 7, 7.5, 8, 9, 10])
+    return {
+        "pk": f"V{i}",
+        "operazione": "I",
+        "datEvento": _day(i),
+        "pkPeriodo": "P1" if i % SCHOOL_DAYS < 140 else "P2",
+        "codCodice": str(value),
+        "valore": value,
+        "codVotoPratico": "N",
+        "docente": f"Cognome{m % teachers} Nome{m % teachers}",
+        "pkMateria": f"M{m}",
+        "tipoValutazione": None,
+        "prgVoto": i,
+        "descrizioneProva": f"Verifica {i}",
+        "faMenoMedia": "",
+        "pkDocente": f"D{m % teachers}",
+        "descrizioneVoto": str(value),
+        "codTipo": rnd.choice("SOP"),
+        "datGiorno": _day(i),
+        "mese": 9,
+        "numMedia": 1.0,
+        "materiaLight": {
+            "scumateriaPK": {
+                "codMin": "SCUOLA",
+                "prgScuola": 1,
+                "numAnno": 2023,
+                "prgMateria": m,
+            },
+            "codMateria": f"C{m}",
+            "desDescrizione": f"Materia {m}",
+            "desDescrAbbrev": f"MAT{m}",
+            "codSuddivisione": "",
+            "codTipo": "N",
+            "flgConcorreMedia": "S",
+            "codAggrDisciplina": None,
+            "flgLezioniIndividuali": None,
+            "codAggrInvalsi": None,
+            "codMinisteriale": f"MIN{m}",
+            "icona": "",
+            "descrizione": None,
+            "conInsufficienze": False,
+            "selezionata": False,
+            "tipoOnGrid": "",
+            "prgMateria": m,
+            "articolata": "",
+            "tipo": "N",
+            "lezioniIndividuali": False,
+            "codEDescrizioneMateria": f"C{m} - Materia {m}",
+            "idmateria": f"ID{m}",
+        },
+        "desMateria": f"Materia {m}",
+        "desCommento": "",
+    }
+
+
+def _lesson(i: int, subjects: int, teachers: int) -> dict:
+    m = i % subjects
+    return {
+        "pk": f"R{i}",
+        "operazione": "I",
+        "datEvento": _day(i // 5),
+        "isFirmato": True,
+        "compiti": (
+            [{"compito": f"Esercizi {i}", "dataConsegna": _day(i // 5 + 2)}]
+            if i % 4 == 0
+            else []
+        ),
+        "docente": f"Cognome{m % teachers} Nome{m % teachers}",
+        "pkMateria": f"M{m}",
+        "desUrl": None,
+        "pkDocente": f"D{m % teachers}",
+        "datGiorno": _day(i // 5),
+        "materia": f"Materia {m}",
+        "attivita": f"Argomento della lezione {i}",
+        "ora": i % 5 + 1,
+    }
+
+
+def _notice(i: int) -> dict:
+    return {
+        "pk": f"B{i}",
+        "operazione": "I",
+        "datEvento": _day(i),
+        "messaggio": f"Circolare n. {i}: comunicazione alle famiglie",
+        "data": _day(i),
+        "pvRichiesta": True,
+        "categoria": "Circolari",
+        "dataConfermaPresaVisione": "",
+        "url": None,
+        "autore": "Dirigente Scolastico",
+        "dataScadenza": "",
+        "adRichiesta": False,
+        "isPresaVisione": False,
+        "dataConfermaAdesione": "",
+        "listaAllegati": [
+            {
+                "pk": f"A{i}",
+                "nomeFile": f"circolare_{i}.pdf",
+                "path": f"/bacheca/circolare_{i}.pdf",
+                "descrizioneFile": f"Circolare {i}",
+                "url": "",
+            }
+        ],
+        "dataScadAdesione": None,
+        "isPresaAdesioneConfermata": False,
+    }
+
+
+def _absence(rnd: random.Random, i: int) -> dict:
+    return {
+        "pk": f"AP{i}",
+        "operazione": "I",
+        "datEvento": _day(i * 7),
+        "descrizione": "Assenza",
+        "data": _day(i * 7),
+        "docente": "Cognome0 Nome0",
+        "nota": "",
+        "daGiustificare": True,
+        "giustificata": "S" if i % 2 else "N",
+        "codEvento": rnd.choice("AIU"),
+        "commentoGiustificazione": "Motivi di salute",
+        "dataGiustificazione": _day(i * 7 + 1),
+    }
+
+
+def _reminder(i: int, teachers: int) -> dict:
+    return {
+        "pk": f"PR{i}",
+        "operazione": "I",
+        "datEvento": _day(i * 3),
+        "desAnnotazioni": f"Promemoria {i}",
+        "pkDocente": f"D{i % teachers}",
+        "flgVisibileFamiglia": "S",
+        "datGiorno": _day(i * 3),
+        "docente": f"Cognome{i % teachers} Nome{i % teachers}",
+        "oraInizio": "08:00",
+        "oraFine": "09:00",
+    }
+
+
+def make_datum(
+    pk: str = "S1",
+    *,
+    grades: int = 400,
+    lessons: int = 1000,
+    notices: int = 150,
+    absences: int = 25,
+    reminders: int = 40,
+    subjects: int = 12,
+    teachers: int = 10,
+    seed: int = 0,
+) -> dict:
+    """Build the dashboard data of a single profile."""
+    rnd = random.Random(seed)
+    return {
+        "pk": pk,
+        "fuoriClasse": [],
+        "msg": "",
+        "opzioni": [{"chiave": "INVALSI", "valore": True}],
+        "mediaGenerale": 7.0,
+        "mediaPerMese": {str(m): 7.0 for m in (9, 10, 11, 12, 1, 2, 3, 4, 5, 6)},
+        "mediaPerPeriodo": {},
+        "mediaMaterie": {f"M{i}": {"numVoti": 10} for i in range(subjects)},
+        "listaMaterie": _subjects(subjects),
+        "rimuoviDatiLocali": False,
+        "listaPeriodi": _periods(),
+        "promemoria": [_reminder(i, teachers) for i in range(reminders)],
+        "bacheca": [_notice(i) for i in range(notices)],
+        "bachecaAlunno": [],
+        "fileCondivisi": {"fileAlunniScollegati": [], "listaFile": []},
+        "voti": [_grade(rnd, i, subjects, teachers) for i in range(grades)],
+        "ricaricaDati": False,
+        "listaDocentiClasse": _teachers(teachers, subjects),
+        "appello": [_absence(rnd, i) for i in range(absences)],
+        "profiloDisabilitato": False,
+        "autocertificazione": {},
+        "registro": [_lesson(i, subjects, teachers) for i in range(lessons)],
+        "schede": [],
+        "prenotazioniAlunni": [],
+        "noteDisciplinari": [],
+        "classiExtra": False,
+    }
+
+
+def make_payload(profiles: int = 1, seed: int = 0, **kwargs) -> dict:
+    """Build a full dashboard response."""
+    return {
+        "success": True,
+        "msg": None,
+        "data": {
+            "dati": [
+                make_datum(f"S{i + 1}", seed=seed + i, **kwargs)
+                for i in range(profiles)
+            ]
+        },
+    }
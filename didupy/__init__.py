@@ -2,8 +2,24 @@
 
 from . import client
 from . import errors
+from . import tokens
+from . import cache
+from . import snapshots
+from . import pool
+from . import scheduler
+from . import downloads
+from . import attachments
+from . import resolver
 
 from .client import DidUPClient
+from .pool import ClientPool
+from .scheduler import PollingScheduler
+from .tokens import TokenStore, FileTokenStore, SQLiteTokenStore
+from .cache import EndpointCache
+from .snapshots import SnapshotStore, FileSnapshotStore
+from .downloads import AttachmentDownloader
+from .attachments import AttachmentCache
+from .resolver import DownloadURLResolver
 
 __version__ = "0.0.1"
 __author__ = "Vinche.zsh"
@@ -0,0 +1,256 @@
+import os
+import time
+import uuid
+import asyncio
+import hashlib
+import sqlite3
+from contextlib import closing, asynccontextmanager
+from typing import Optional, AsyncIterator, TYPE_CHECKING
+
+import aiohttp
+
+from .utils import DEFAULT_CHUNK_SIZE, stream_url
+
+if TYPE_CHECKING:
+    from .client import DidUPClient
+    from .downloads import Downloadable
+
+
+def _cache_key(item: "Downloadable", school_code: str) -> str:
+    # school-wide attachments share the same path between students, but
+    # paths are only known to be unique within a school
+    return f"{school_code}:{getattr(item, 'path', None) or item.pk}"
+
+
+def _hash_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(DEFAULT_CHUNK_SIZE):
+            h.update(chunk)
+
+    return h.hexdigest()
+
+
+class AttachmentCache:
+    """
+    Content-addressed on-disk cache for attachments, shared between accounts.
+
+    Files are looked up by school and attachment path (or pk, when there is
+    none) and stored once per content, named after their SHA-256. Reads only
+    check the size and modification time of a file; if the latter changed,
+    its hash is checked again unless verify is unset, and a damaged file is
+    downloaded again instead of being served. The least recently used
+    files are evicted once the cache grows over max_size bytes.
+
+    Safe to share between processes, as the index is a SQLite database.
+
+    cache = AttachmentCache("attachments", max_size=2 * 1024**3)
+    client = DidUPClient(..., attachment_cache=cache)
+    """
+
+    def __init__(self, directory: str, max_size: int = 1024**3, verify: bool = True):
+        if max_size <= 0:
+            raise ValueError("max_size must be positive")
+
+        self.directory = directory
+        self.max_size = max_size
+        self.verify = verify
+        self.__locks: dict[str, asyncio.Lock] = {}
+        self.__waiters: dict[str, int] = {}
+
+        os.makedirs(os.path.join(directory, "blobs"), exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS blobs (digest TEXT PRIMARY KEY, "
+                "size INTEGER NOT NULL, last_used REAL NOT NULL, mtime_ns INTEGER)"
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(blobs)")]
+            if "mtime_ns" not in columns:
+                # created by an older version, which hashed on every read
+                conn.execute("ALTER TABLE blobs ADD COLUMN mtime_ns INTEGER")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries "
+                "(key TEXT PRIMARY KEY, digest TEXT NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # a new connection every time, since we are called from worker threads
+        return sqlite3.connect(
+            os.path.join(self.directory, "index.sqlite3"), timeout=30
+        )
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.directory, "blobs", digest[:2], digest)
+
+    def _forget(self, conn: sqlite3.Connection, digest: str):
+        conn.execute("DELETE FROM entries WHERE digest = ?", (digest,))
+        conn.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+        try:
+            os.remove(self._blob_path(digest))
+        except FileNotFoundError:
+            pass
+
+    def _lookup(self, key: str) -> Optional[str]:
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute(
+                "SELECT blobs.digest, blobs.size, blobs.mtime_ns FROM entries "
+                "JOIN blobs ON blobs.digest = entries.digest WHERE entries.key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+
+            digest, size, mtime_ns = row
+            path = self._blob_path(digest)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                stat = None
+
+            if stat is None or stat.st_size != size:
+                ok = False
+            elif stat.st_mtime_ns == mtime_ns or not self.verify:
+                # untouched since its hash was checked
+                ok = True
+            else:
+                ok = _hash_file(path) == digest
+
+            if not ok:
+                self._forget(conn, digest)
+                return None
+
+            conn.execute(
+                "UPDATE blobs SET last_used = ?, mtime_ns = ? WHERE digest = ?",
+                (time.time(), stat.st_mtime_ns, digest),  # type: ignore
+            )
+            return path
+
+    def _commit(self, key: str, tmp: str, digest: str, size: int) -> str:
+        path = self._blob_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # same content under another key, keep the copy we already have,
+        # unless it is damaged: this is the one time its hash is checked
+        if (
+            os.path.exists(path)
+            and os.path.getsize(path) == size
+            and (not self.verify or _hash_file(path) == digest)
+        ):
+            os.remove(tmp)
+        else:
+            os.replace(tmp, path)
+
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO blobs (digest, size, last_used, mtime_ns) "
+                "VALUES (?, ?, ?, ?)",
+                (digest, size, time.time(), os.stat(path).st_mtime_ns),
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, digest) VALUES (?, ?)",
+                (key, digest),
+            )
+            self._evict(conn, keep=digest)
+
+        return path
+
+    def _evict(self, conn: sqlite3.Connection, keep: str):
+        (total,) = conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        if total <= self.max_size:
+            return
+
+        rows = conn.execute(
+            "SELECT digest, size FROM blobs WHERE digest != ? ORDER BY last_used",
+            (keep,),
+        ).fetchall()
+        for digest, size in rows:
+            if total <= self.max_size:
+                break
+
+            self._forget(conn, digest)
+            total -= size
+
+    def _size(self) -> int:
+        with closing(self._connect()) as conn, conn:
+            (total,) = conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM blobs"
+            ).fetchone()
+
+        return total
+
+    def _clear(self):
+        with closing(self._connect()) as conn, conn:
+            for (digest,) in conn.execute("SELECT digest FROM blobs").fetchall():
+                self._forget(conn, digest)
+
+    async def get(self, key: str) -> Optional[str]:
+        """Return the path of the cached file for the given key, if any."""
+        return await asyncio.to_thread(self._lookup, key)
+
+    async def put(self, key: str, chunks: AsyncIterator[bytes]) -> str:
+        """Store the file made of the given chunks, returning its path."""
+        tmp = os.path.join(self.directory, f".{uuid.uuid4().hex}.tmp")
+        h = hashlib.sha256()
+        size = 0
+
+        def write(f, chunk: bytes):
+            f.write(chunk)
+            h.update(chunk)
+
+        try:
+            f = await asyncio.to_thread(open, tmp, "wb")
+            try:
+                async for chunk in chunks:
+                    await asyncio.to_thread(write, f, chunk)
+                    size += len(chunk)
+            finally:
+                await asyncio.to_thread(f.close)
+
+            return await asyncio.to_thread(self._commit, key, tmp, h.hexdigest(), size)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    async def fetch(self, item: "Downloadable", client: "DidUPClient") -> str:
+        """
+        Return the path of the cached copy of an ItemAttachment or SharedFile,
+        downloading it with the given client first if needed.
+        """
+        key = _cache_key(item, client.school_code)
+        # only one download per key at a time within this process
+        async with self.__lock(key):
+            path = await self.get(key)
+            if path is not None:
+                return path
+
+            url = await item.get_download_url()
+            try:
+                return await self.put(key, stream_url(client.session, url))
+            except aiohttp.ClientResponseError as e:
+                # the URL expired, or the cached one was already too old to use
+                if e.status != 403:
+                    raise
+
+            url = await item.get_download_url(refresh=True)
+            return await self.put(key, stream_url(client.session, url))
+
+    @asynccontextmanager
+    async def __lock(self, key: str) -> AsyncIterator[None]:
+        # locks are dropped once nobody holds or waits for them, so that
+        # they don't pile up for every attachment ever fetched
+        lock = self.__locks.setdefault(key, asyncio.Lock())
+        self.__waiters[key] = self.__waiters.get(key, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self.__waiters[key] -= 1
+            if not self.__waiters[key]:
+                del self.__waiters[key]
+                del self.__locks[key]
+
+    async def size(self) -> int:
+        """The total size of the cached files, in bytes."""
+        return await asyncio.to_thread(self._size)
+
+    async def clear(self):
+        await asyncio.to_thread(self._clear)
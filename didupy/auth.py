@@ -18,8 +18,13 @@ from .config import (
     CODE_CHALLENGE_METHOD,
     MOBILE_CLIENT_ID,
 )
-from .utils import generate_22byte_b64_string, get_pkce_pair, DidUPyResponse
-from .errors import DidUPyError
+from .utils import (
+    generate_22byte_b64_string,
+    get_pkce_pair,
+    read_response,
+    DidUPyResponse,
+)
+from .errors import DidUPyError, AuthenticationError
 
 
 class ArgoLoginHandler:
@@ -109,12 +114,8 @@ class ArgoLoginHandler:
             if raise_for_status:
                 response.raise_for_status()
 
-            try:
-                content = await response.json()
-            except aiohttp.ContentTypeError:
-                content = (await response.content.read()).decode()
-
-            return (content, response)
+            content = await read_response(response, self.client.json_loads)
+            return (content, response)  # type: ignore
 
     async def oauth2_login(self, code_challenge: str = "") -> DidUPyResponse:
         return await self.request(
@@ -173,6 +174,33 @@ class ArgoLoginHandler:
 
         return (ret, resp)
 
+    async def refresh(self, refresh_token: str) -> dict:
+        """
+        Exchange a refresh token for a new access token.
+
+        Raises AuthenticationError if the refresh token was rejected.
+        """
+        token, resp = await self.request(
+            "POST",
+            "token",
+            data={
+                "grant_type": "refresh_token",
+                "refresh_token": refresh_token,
+            },
+            headers={
+                "Content-Type": "application/x-www-form-urlencoded",
+            },
+            raise_for_status=False,
+        )
+
+        if resp.status in (400, 401, 403):
+            # invalid_grant and friends: the refresh token is expired or revoked
+            raise AuthenticationError(f"Refresh token rejected: {resp.status}")
+        elif resp.status != 200 or not isinstance(token, dict):
+            raise DidUPyError(f"Token refresh failed: {resp.status}")
+
+        return token
+
     async def login(
         self, school_code: str, username: str, password: str
     ) -> tuple[dict, dict]:
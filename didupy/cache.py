@@ -0,0 +1,90 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+CacheKey = Tuple[str, int, str, Hashable]
+"""(account, profile index, endpoint name, arguments)"""
+
+
+class EndpointCache:
+    """
+    In-memory LRU cache for endpoint responses, with a TTL per endpoint.
+
+    Only the endpoints with a TTL (in seconds) are cached. A single cache can
+    be shared between many clients, as keys include the account.
+    """
+
+    DEFAULT_TTL = {
+        "profilo": 3600.0,
+        "dettaglio_profilo": 3600.0,
+        "curriculum": 86400.0,
+        "voti_scrutinio": 3600.0,
+        "orario_giorno": 3600.0,
+    }
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: Optional[dict[str, float]] = None,
+    ):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+
+        self.maxsize = maxsize
+        self.ttl = dict(self.DEFAULT_TTL if ttl is None else ttl)
+        self.__entries: OrderedDict[CacheKey, Tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def caches(self, endpoint: str) -> bool:
+        return self.ttl.get(endpoint) is not None
+
+    def get(self, key: CacheKey) -> Tuple[bool, Any]:
+        """Return (hit, value) for the given key."""
+        entry = self.__entries.get(key)
+        if entry is None:
+            return (False, None)
+
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            del self.__entries[key]
+            return (False, None)
+
+        self.__entries.move_to_end(key)
+        return (True, value)
+
+    def set(self, key: CacheKey, value: Any):
+        ttl = self.ttl.get(key[2])
+        if ttl is None:
+            return
+
+        self.__entries[key] = (time.monotonic() + ttl, value)
+        self.__entries.move_to_end(key)
+        while len(self.__entries) > self.maxsize:
+            self.__entries.popitem(last=False)
+
+    def invalidate(
+        self,
+        account: Optional[str] = None,
+        endpoint: Optional[str] = None,
+        profile: Optional[int] = None,
+    ) -> int:
+        """
+        Drop the entries matching all the given filters (everything if none
+        is given). Returns how many were dropped.
+        """
+        keys = [
+            key
+            for key in self.__entries
+            if (account is None or key[0] == account)
+            and (profile is None or key[1] == profile)
+            and (endpoint is None or key[2] == endpoint)
+        ]
+        for key in keys:
+            del self.__entries[key]
+
+        return len(keys)
+
+    def clear(self):
+        self.__entries.clear()
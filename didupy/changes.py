@@ -0,0 +1,99 @@
+from typing import Hashable, TYPE_CHECKING
+from dataclasses import dataclass
+
+from .dataclasses import (
+    Grade,
+    HomeworkAssigned,
+    ChangeEvent,
+    GradeAdded,
+    GradeChanged,
+    InboxItemAdded,
+    AbsenceAdded,
+    HomeworkAdded,
+    ReminderAdded,
+)
+
+if TYPE_CHECKING:
+    from .dashboard import Dashboard
+
+
+def _grade_key(grade: Grade) -> tuple:
+    # what can change on a grade without it getting a new pk
+    return (
+        grade.label,
+        grade.value,
+        grade.date,
+        grade.description,
+        grade.comment,
+        grade.counts_towards_avg,
+    )
+
+
+def _homework_key(hw: HomeworkAssigned) -> Hashable:
+    # homework has no pk of its own
+    return (hw.date, hw.due_date, getattr(hw.subject, "pk", hw.subject), hw.text)
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """pk-keyed indexes of the dashboard sections the change feed looks at."""
+
+    grades: dict
+    inbox: dict
+    absences: dict
+    reminders: dict
+    homework: dict
+
+    @classmethod
+    def of(cls, dashboard: "Dashboard") -> "Snapshot":
+        # sections the dashboard doesn't keep never change
+        keeps = dashboard._keeps  # pylint: disable=protected-access
+        return cls(
+            grades={g.pk: g for g in dashboard.grades} if keeps("grades") else {},
+            inbox={i.pk: i for i in dashboard.inbox} if keeps("inbox") else {},
+            absences=(
+                {a.pk: a for a in dashboard.absences} if keeps("absences") else {}
+            ),
+            reminders=(
+                {r.pk: r for r in dashboard.reminders} if keeps("reminders") else {}
+            ),
+            homework=(
+                {_homework_key(h): h for h in dashboard.homework}
+                if keeps("homework")
+                else {}
+            ),
+        )
+
+
+def diff(old: Snapshot, new: Snapshot) -> list[ChangeEvent]:
+    """Compute the changes between two snapshots in O(n)."""
+    events: list[ChangeEvent] = []
+    for pk, grade in new.grades.items():
+        prev = old.grades.get(pk)
+        if prev is None:
+            events.append(GradeAdded(grade=grade))
+        elif _grade_key(prev) != _grade_key(grade):
+            events.append(GradeChanged(old=prev, new=grade))
+
+    events.extend(
+        InboxItemAdded(item=item)
+        for pk, item in new.inbox.items()
+        if pk not in old.inbox
+    )
+    events.extend(
+        AbsenceAdded(absence=absence)
+        for pk, absence in new.absences.items()
+        if pk not in old.absences
+    )
+    events.extend(
+        HomeworkAdded(homework=hw)
+        for key, hw in new.homework.items()
+        if key not in old.homework
+    )
+    events.extend(
+        ReminderAdded(reminder=rem)
+        for pk, rem in new.reminders.items()
+        if pk not in old.reminders
+    )
+
+    return events
@@ -1,5 +1,9 @@
+import random
+import asyncio
+import logging
+from contextlib import nullcontext
 from types import SimpleNamespace
-from typing import Optional, Mapping, Any, Iterable, Union, Self
+from typing import Optional, Mapping, Any, Iterable, Union, Self, AsyncContextManager
 from urllib.parse import urljoin, urlsplit
 from datetime import datetime, timedelta
 from warnings import warn
@@ -16,12 +20,28 @@ from aiohttp.typedefs import StrOrURL, LooseCookies, LooseHeaders
 from pytz import timezone
 
 from .config import ARGO_APP_VERSION
-from .utils import DidUPyResponse
+from .utils import (
+    DidUPyResponse,
+    JSONLoads,
+    default_json_loads,
+    gather,
+    read_response,
+)
 from .auth import ArgoLoginHandler
-from .errors import ResponseError
+from .errors import ResponseError, AuthenticationError
+from .dataclasses import TokenData
+from .tokens import TokenStore
+from .cache import EndpointCache
+from .snapshots import SnapshotStore
+from .attachments import AttachmentCache
+from .resolver import DownloadURLResolver
 from .me import Me
+from .dashboard import Dashboard, with_dependencies
+from .endpoints.types import DashboardResponse
 from .endpoints import Endpoints
 
+_log = logging.getLogger(__name__)
+
 
 class DidUPClient:
     """
@@ -40,6 +60,22 @@ class DidUPClient:
         username: str,
         password: str,
         app_version: str = ARGO_APP_VERSION,
+        token_store: Optional[TokenStore] = None,
+        auto_renew: bool = False,
+        renew_margin: float = 300.0,
+        renew_jitter: float = 30.0,
+        lazy_dashboard: bool = False,
+        connector: Optional[aiohttp.BaseConnector] = None,
+        login_limiter: Optional[AsyncContextManager] = None,
+        request_limiter: Optional[AsyncContextManager] = None,
+        cache: Optional[EndpointCache] = None,
+        snapshot_store: Optional[SnapshotStore] = None,
+        stale_while_revalidate: bool = False,
+        json_loads: JSONLoads = default_json_loads,
+        attachment_cache: Optional[AttachmentCache] = None,
+        url_resolver: Optional[DownloadURLResolver] = None,
+        keep_raw: bool = True,
+        dashboard_sections: Optional[Iterable[str]] = None,
     ):
         self._session = None
         self.school_code = school_code
@@ -49,19 +85,60 @@ class DidUPClient:
         self.__token = None
         self.__refresh_token = None
         self.__login_response = None
+        self.__mobile_login = None
         self.__expires_in = None
         self.__logged_in_at = None
-        self.__me = None
+        self.__profiles: list[Me] = []
         self.app_version = app_version
         self.__endpoints = None
         self._login_lock = Lock()
+        self.token_store = token_store
+        self.__from_store = False
+        self.auto_renew = auto_renew
+        self.renew_margin = renew_margin
+        self.renew_jitter = renew_jitter
+        self.__renew_task: Optional[asyncio.Task] = None
+        self.__revalidate_task: Optional[asyncio.Task] = None
+        self.__closed = False
+        self.lazy_dashboard = lazy_dashboard
+        self.connector = connector
+        # e.g. semaphores shared between many clients
+        self.login_limiter = login_limiter
+        self.request_limiter = request_limiter
+        self.cache = cache
+        self.snapshot_store = snapshot_store
+        self.stale_while_revalidate = stale_while_revalidate
+        self.json_loads = json_loads
+        self.attachment_cache = attachment_cache
+        self.url_resolver = (
+            DownloadURLResolver() if url_resolver is None else url_resolver
+        )
+        # without the raw data, fetches can't be incremental and no snapshots are saved
+        self.keep_raw = keep_raw
+        # None for all of them, see dashboard.SECTIONS
+        self.dashboard_sections = (
+            None
+            if dashboard_sections is None
+            else with_dependencies(dashboard_sections)
+        )
 
     @property
     def session(self) -> aiohttp.ClientSession:
         if self._session is None or self._session.closed:
-            self._session = aiohttp.ClientSession()
+            # a shared connector only shares the connection pool, each client
+            # keeps its own cookie jar so SSO cookies don't leak between accounts
+            self._session = aiohttp.ClientSession(
+                connector=self.connector,
+                connector_owner=self.connector is None,
+                cookie_jar=aiohttp.CookieJar(),
+            )
         return self._session
 
+    @property
+    def account_key(self) -> str:
+        """Key identifying this account in a token store."""
+        return f"{self.school_code}:{self.username}"
+
     @property
     def endpoints(self) -> Endpoints:
         if self.__endpoints is None:
@@ -77,12 +154,28 @@ class DidUPClient:
         return self.__login_handler
 
     async def close(self):
+        # nothing running in the background may log us in again from now on
+        self.__closed = True
+        task = self.__revalidate_task
+        self.__revalidate_task = None
+        if task is not None and not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        if self.__renew_task is not None:
+            self.__renew_task.cancel()
+            try:
+                await self.__renew_task
+            except asyncio.CancelledError:
+                pass
+            self.__renew_task = None
+
         if self._session and not self._session.closed:
             await self._session.close()
             self._session = None
 
         self.__endpoints = None
-        self.__me = None
+        self.__profiles = []
 
     async def __aenter__(self):
         await self.session.__aenter__()
@@ -90,7 +183,6 @@ class DidUPClient:
         return self
 
     async def __aexit__(self, exc_type, exc, tb):
-        await self.session.__aexit__(exc_type, exc, tb)
         await self.close()
 
     async def __await_login(self) -> Self:
@@ -101,7 +193,7 @@ class DidUPClient:
         return self.__await_login().__await__()
 
     def __del__(self):
-        if self.__endpoints or self.__me:
+        if self.__endpoints or self.__profiles:
             warn(
                 "didUPy not closed. Did you forget to call 'close()' or use a context manager?",
                 ResourceWarning,
@@ -111,48 +203,370 @@ class DidUPClient:
 
     @property
     def me(self) -> Me:
-        if self.__me is None:
+        """The first (and usually only) profile of this account."""
+        if not self.__profiles:
             raise ValueError("Not logged in. Call 'login()' first.")
 
-        return self.__me
+        return self.__profiles[0]
+
+    @property
+    def profiles(self) -> list[Me]:
+        """
+        All the profiles of this account (e.g. one for each child of a parent).
+        """
+        if not self.__profiles:
+            raise ValueError("Not logged in. Call 'login()' first.")
+
+        return list(self.__profiles)
 
     async def login(self, handle_exc=False) -> bool:
+        self.__closed = False
         async with self._login_lock:
-            return await self._login(handle_exc)
+            ret = await self._login(handle_exc)
+
+        if ret and self.auto_renew:
+            self._start_renewal()
+
+        return ret
+
+    def _needs_login(self) -> bool:
+        return (
+            not self.__profiles
+            or self.token is None
+            or self.expires_at is None
+            or datetime.now(timezone("Europe/Rome")) >= self.expires_at
+        )
+
+    async def _ensure_login(self):
+        """
+        Log in unless someone else already did it while we were waiting.
 
-    async def _login(self, handle_exc=False) -> bool:
+        Concurrent callers with expired credentials all wait for the same
+        login instead of logging in one after the other.
+        """
+        async with self._login_lock:
+            if not self._needs_login():
+                return
+
+            if self.__closed:
+                raise ValueError("Client closed. Call 'login()' to use it again.")
+
+            await self._login(reload=False)
+
+        if self.auto_renew:
+            self._start_renewal()
+
+    def _start_renewal(self):
+        if self.__renew_task is None or self.__renew_task.done():
+            self.__renew_task = asyncio.create_task(self.__renew_loop())
+
+    async def __renew_loop(self):
+        """
+        Renew the credentials renew_margin seconds (minus up to renew_jitter
+        seconds) before they expire, so that requests never have to wait for it.
+        """
+        failures = 0
+        while True:
+            expires_at = self.expires_at
+            if failures:
+                delay = min(2**failures, 300)
+            elif expires_at is None:
+                delay = 0
+            else:
+                # short-lived tokens are renewed halfway through at the earliest,
+                # or a margin longer than their lifetime would renew them nonstop
+                margin = min(
+                    self.renew_margin + random.uniform(0, self.renew_jitter),
+                    (self.__expires_in or 0) / 2,
+                )
+                delay = max(
+                    (expires_at - datetime.now(timezone("Europe/Rome"))).total_seconds()
+                    - margin,
+                    1.0,
+                )
+
+            await asyncio.sleep(max(delay, 0))
+            try:
+                await self.renew()
+            except Exception:  # pylint: disable=broad-except
+                failures += 1
+                _log.warning(
+                    "Background renewal failed for %s", self.account_key, exc_info=True
+                )
+            else:
+                failures = 0
+
+    async def _login(self, handle_exc=False, reload=True) -> bool:
+        """
+        Get new credentials and, if reload is set or this is the first login,
+        (re)load the profile and dashboard data.
+        """
+        self.__from_store = False
+        renewing = not reload
+        current = (
+            self.__token,
+            self.__login_response,
+            self.__expires_in,
+            self.__logged_in_at,
+        )
+        still_valid_until = self.expires_at
         try:
-            token, mobile_token = await self.__login.login(
-                school_code=self.school_code,
-                username=self.username,
-                password=self.password,
-            )
-            # TODO: use the refresh token
+            async with self.login_limiter or nullcontext():
+                token, mobile_token = await self._get_credentials()
             self.__login_response = token
+            self.__mobile_login = mobile_token
             self.__token = token.get("access_token")
-            self.__refresh_token = token.get("refresh_token")
+            # the refresh grant does not always rotate the refresh token
+            self.__refresh_token = token.get("refresh_token", self.__refresh_token)
             self.__expires_in = token.get("expires_in", 0)
             self.__logged_in_at = datetime.now(timezone("Europe/Rome"))
-            self.__endpoints = Endpoints(self)
-            if not self.__me:
-                self.__me = Me(self)
+            if self.__endpoints is None:
+                self.__endpoints = Endpoints(self)
 
-            await self.__me._fill_data(mobile_token)  # pylint: disable=protected-access
+            entries = [
+                x
+                for x in mobile_token.get("data", [])
+                if x.get("username", None) == self.username
+            ]
+            if not entries:
+                raise ValueError("No valid profile found.")
+
+            if len(entries) != len(self.__profiles):
+                self.__profiles = [Me(self) for _ in entries]
+                reload = True
+
+            for me, entry in zip(self.__profiles, entries):
+                me._set_credentials(entry)  # pylint: disable=protected-access
+
+            if reload:
+                await self.reload()
 
             return True
         except Exception as e:
-            self.__token = None
-            self.__refresh_token = None
-            self.__login_response = None
-            self.__expires_in = None
-            self.__logged_in_at = None
-            self.__endpoints = None
-            self.__me = None
+            # the refresh token is only dropped once it is rejected (see
+            # _renew_credentials), a network error doesn't make it invalid
+            if (
+                renewing
+                and still_valid_until is not None
+                and datetime.now(timezone("Europe/Rome")) < still_valid_until
+            ):
+                # a failed renewal keeps using the current token until it
+                # expires, the renewal loop will try again before that
+                (
+                    self.__token,
+                    self.__login_response,
+                    self.__expires_in,
+                    self.__logged_in_at,
+                ) = current
+            else:
+                self.__token = None
+                self.__login_response = None
+                self.__expires_in = None
+                self.__logged_in_at = None
+            if reload:
+                # a failed renewal keeps the data we already have
+                self.__endpoints = None
+                self.__profiles = []
+
+            if self.__from_store and self.token_store is not None:
+                # the stored credentials might be the reason we failed
+                await self.token_store.delete(self.account_key)
+
             if handle_exc:
                 return False
 
             raise e
 
+    async def renew(self, handle_exc=False) -> bool:
+        """
+        Renew the credentials only, keeping the current profile and dashboard.
+
+        Use 'reload()' to refresh the data afterwards if needed.
+        """
+        async with self._login_lock:
+            ret = await self._login(handle_exc, reload=False)
+
+        if ret and self.auto_renew:
+            self._start_renewal()
+
+        return ret
+
+    async def reload(self):
+        """
+        Reload the data of every profile without logging in again.
+
+        The dashboard holds the data of all the profiles, so it is only
+        downloaded once.
+        """
+        profiles = self.profiles
+        with_dashboard = not self.lazy_dashboard or any(
+            p.dashboard.loaded for p in profiles
+        )
+
+        revalidate = False
+        if with_dashboard and self.stale_while_revalidate:
+            # keep serving the data we have (or the stored snapshots) and
+            # refresh it in the background
+            # pylint: disable-next=protected-access
+            restored = await gather(*(p._dashboard._restore_stale() for p in profiles))
+            revalidate = all(restored)
+            with_dashboard = not revalidate
+
+        fetched_at = datetime.now(timezone("Europe/Rome"))
+        aws = [p.fetch() for p in profiles]
+        if with_dashboard:
+            aws.append(self.me.endpoints.dashboard())
+
+        results = await gather(*aws)
+        if with_dashboard:
+            # pylint: disable-next=protected-access
+            dashboards = [p._dashboard for p in profiles]
+            await self._load_dashboards(dashboards, results[-1], fetched_at)
+            # pylint: disable-next=protected-access
+            await gather(*(d._save_snapshot() for d in dashboards))
+        elif revalidate:
+            self.revalidate()
+
+    @property
+    def revalidating(self) -> bool:
+        return self.__revalidate_task is not None and not self.__revalidate_task.done()
+
+    def revalidate(self) -> asyncio.Task:
+        """
+        Refresh the dashboards of every profile in the background, with a
+        single incremental download. The current data stays available until
+        the new one is ready, and is kept if the refresh fails.
+
+        Calling it again while a refresh is running returns the same task.
+        """
+        if self.__revalidate_task is None or self.__revalidate_task.done():
+            self.__revalidate_task = asyncio.create_task(self.__revalidate())
+
+        return self.__revalidate_task
+
+    async def __revalidate(self):
+        try:
+            await self.refresh_dashboards(incremental=True)
+        except Exception:  # pylint: disable=broad-except
+            _log.warning(
+                "Dashboard revalidation failed for %s", self.account_key, exc_info=True
+            )
+
+    async def refresh_dashboards(self, incremental: bool = False):
+        """
+        Fetch the dashboards of every profile again, including the ones that
+        were never loaded.
+
+        The dashboard holds the data of all the profiles, so it is only
+        downloaded once (twice if an incremental fetch needs a full reload).
+        """
+        # pylint: disable=protected-access
+        dashboards = [p._dashboard for p in self.profiles]
+        for dashboard in dashboards:
+            dashboard._clear_changes()
+
+        fetched_at = datetime.now(timezone("Europe/Rome"))
+        pending = dashboards
+        mergeable = [d for d in dashboards if d._can_merge()]
+        if incremental and mergeable:
+            since = min(d.last_update for d in mergeable)  # type: ignore
+            payload = await self.me.endpoints.dashboard(since)
+            pending = [
+                d
+                for d in dashboards
+                if not (d._can_merge() and d._merge(payload, fetched_at))
+            ]
+
+        if pending:
+            payload = await self.me.endpoints.dashboard()
+            await self._load_dashboards(pending, payload, fetched_at)
+
+        await gather(*(d._save_snapshot() for d in dashboards))
+
+    async def _load_dashboards(
+        self,
+        dashboards: list[Dashboard],
+        payload: DashboardResponse,
+        fetched_at: datetime,
+    ):
+        """
+        Load the dashboards from a response downloaded with the first profile,
+        fetching the ones it has no data for with their own profile.
+        """
+        # pylint: disable=protected-access
+        missing = []
+        for dashboard in dashboards:
+            if dashboard._find(payload) is None:
+                missing.append(dashboard)
+            else:
+                dashboard._load(payload, fetched_at)
+
+        await gather(*(d._fetch() for d in missing))
+
+    async def _get_credentials(self) -> tuple[dict, dict]:
+        """
+        Get valid credentials, sharing them through the token store if set.
+        """
+        if self.token_store is None:
+            return await self._renew_credentials()
+
+        key = self.account_key
+        async with self.token_store.lock(key):
+            stored = await self.token_store.load(key)
+            if stored is not None:
+                now = datetime.now(timezone("Europe/Rome"))
+                remaining = (stored.expires_at - now).total_seconds()
+                if stored.token != self.__token and remaining > 60:
+                    # someone else (or a previous run) already logged in
+                    self.__from_store = True
+                    return (
+                        {
+                            "access_token": stored.token,
+                            "refresh_token": stored.refresh_token,
+                            "expires_in": remaining,
+                        },
+                        stored.mobile_login,
+                    )
+
+                if stored.refresh_token:
+                    # might have been rotated by someone else
+                    self.__refresh_token = stored.refresh_token
+                    self.__mobile_login = self.__mobile_login or stored.mobile_login
+
+            token, mobile_login = await self._renew_credentials()
+            await self.token_store.save(
+                key,
+                TokenData(
+                    token=token["access_token"],
+                    refresh_token=token.get("refresh_token", self.__refresh_token),
+                    expires_at=datetime.now(timezone("Europe/Rome"))
+                    + timedelta(seconds=token.get("expires_in", 0)),
+                    mobile_login=mobile_login,
+                ),
+            )
+            return (token, mobile_login)
+
+    async def _renew_credentials(self) -> tuple[dict, dict]:
+        """
+        Get a new access token, using the refresh token when possible.
+
+        Falls back to the full SSO login only if the refresh token is rejected.
+        """
+        if self.__refresh_token and self.__mobile_login:
+            try:
+                token = await self.__login.refresh(self.__refresh_token)
+            except AuthenticationError:
+                self.__refresh_token = None
+            else:
+                # the mobile token is not tied to the access token, keep it
+                return (token, self.__mobile_login)
+
+        return await self.__login.login(
+            school_code=self.school_code,
+            username=self.username,
+            password=self.password,
+        )
+
     @property
     def token(self) -> Optional[str]:
         return self.__token
@@ -196,19 +610,12 @@ class DidUPClient:
         proxy_headers: Optional[LooseHeaders] = None,
         trace_request_ctx: Optional[SimpleNamespace] = None,
         read_bufsize: Optional[int] = None,
+        auth_token: Optional[str] = None,
+        raw: bool = False,
     ) -> DidUPyResponse:
 
-        try:
-            self.me
-        except ValueError:
-            await self.login()
-        else:
-            if (
-                self.token is None
-                or self.expires_at is None
-                or datetime.now(timezone("Europe/Rome")) >= self.expires_at
-            ):
-                await self.login()
+        if self._needs_login():
+            await self._ensure_login()
 
         if not endpoint.startswith(self.BASE_URL):
             if urlsplit(endpoint).scheme:
@@ -239,6 +646,8 @@ class DidUPClient:
             proxy_headers=proxy_headers,
             trace_request_ctx=trace_request_ctx,
             read_bufsize=read_bufsize,
+            auth_token=auth_token,
+            raw=raw,
         )
 
     async def _request(
@@ -265,44 +674,49 @@ class DidUPClient:
         proxy_headers: Optional[LooseHeaders] = None,
         trace_request_ctx: Optional[SimpleNamespace] = None,
         read_bufsize: Optional[int] = None,
+        auth_token: Optional[str] = None,
+        raw: bool = False,
     ) -> DidUPyResponse:
 
         headers = headers or {}
         headers["Argo-Client-Version"] = self.app_version  # type: ignore
         headers["Authorization"] = f"Bearer {self.token}"  # type: ignore
-        headers["X-Auth-Token"] = self.me.token  # type: ignore
+        headers["X-Auth-Token"] = auth_token or self.me.token  # type: ignore
         headers["X-Cod-Min"] = self.school_code  # type: ignore
         headers["X-Date-Exp-Auth"] = "9999-12-31 23-59-59.000"  # type: ignore
 
-        async with self.session.request(
-            method,
-            endpoint,
-            params=params,
-            data=data,
-            json=json,
-            cookies=cookies,
-            headers=headers,
-            skip_auto_headers=skip_auto_headers,
-            compress=compress,
-            chunked=chunked,
-            raise_for_status=False,
-            read_until_eof=read_until_eof,
-            proxy=proxy,
-            timeout=timeout,
-            verify_ssl=verify_ssl,  # type: ignore
-            fingerprint=fingerprint,  # type: ignore
-            ssl_context=ssl_context,  # type: ignore
-            ssl=ssl,
-            proxy_headers=proxy_headers,
-            trace_request_ctx=trace_request_ctx,
-            read_bufsize=read_bufsize,
-        ) as response:
-            if raise_for_status:
-                response.raise_for_status()
-
-            try:
-                content = await response.json()
-                if content.get("success", True) is False:
+        async with self.request_limiter or nullcontext():
+            async with self.session.request(
+                method,
+                endpoint,
+                params=params,
+                data=data,
+                json=json,
+                cookies=cookies,
+                headers=headers,
+                skip_auto_headers=skip_auto_headers,
+                compress=compress,
+                chunked=chunked,
+                raise_for_status=False,
+                read_until_eof=read_until_eof,
+                proxy=proxy,
+                timeout=timeout,
+                verify_ssl=verify_ssl,  # type: ignore
+                fingerprint=fingerprint,  # type: ignore
+                ssl_context=ssl_context,  # type: ignore
+                ssl=ssl,
+                proxy_headers=proxy_headers,
+                trace_request_ctx=trace_request_ctx,
+                read_bufsize=read_bufsize,
+            ) as response:
+                if raise_for_status:
+                    response.raise_for_status()
+
+                if raw:
+                    return (await response.read(), response)
+
+                content = await read_response(response, self.json_loads)
+                if isinstance(content, dict) and content.get("success", True) is False:
                     raise ResponseError(
                         status_code=response.status,
                         message=content.get(
@@ -310,7 +724,5 @@ class DidUPClient:
                             content.get("message", "Error in response from server"),
                         ),
                     )
-            except aiohttp.ContentTypeError:
-                content = (await response.content.read()).decode()
 
-            return (content, response)
+                return (content, response)  # type: ignore
@@ -1,7 +1,14 @@
-import io
-from datetime import date, time
-from typing import Union, BinaryIO, Optional, Any
+import sys
+import asyncio
+from bisect import bisect_right
+from datetime import date, time, datetime, timedelta
+from typing import Union, BinaryIO, Optional, Any, AsyncIterator, Callable, Iterable
+import aiohttp
+from pytz import timezone
+from .changes import Snapshot, diff
 from .dataclasses import (
+    ChangeEvent,
+    DashboardSnapshot,
     DashboardOptions,
     Period,
     Grade,
@@ -22,67 +29,232 @@ from .dataclasses import (
     OutOfClass,
     SharedFile,
 )
+from .endpoints import Endpoints
+from .errors import DidUPyError
+from .utils import DEFAULT_CHUNK_SIZE, read_chunks, stream_url, write_chunks
 from .endpoints.types import (
     BachecaEntry,
     BachecaAllegato,
+    DashboardResponse,
     DashboardResponseDatum,
     Materia,
 )
 
+# sections made of entries with an 'operazione' field, which incremental
+# responses only contain when they were added, changed or deleted
+_EVENT_SECTIONS = (
+    "voti",
+    "bacheca",
+    "bachecaAlunno",
+    "registro",
+    "appello",
+    "promemoria",
+    "fuoriClasse",
+    "noteDisciplinari",
+    "prenotazioniAlunni",
+)
+
+
+_SECTION_BUILDERS = {
+    "periods": "_build_periods",
+    "subjects": "_build_entities",
+    "teachers": "_build_entities",
+    "grades": "_build_grades",
+    "options": "_build_options",
+    "inbox": "_build_inbox",
+    "reminders": "_build_reminders",
+    "absences": "_build_absences",
+    "homework": "_build_homework",
+    "register": "_build_register",
+    "out_of_class": "_build_out_of_class",
+    "shared_files": "_build_shared_files",
+}
+SECTIONS = tuple(_SECTION_BUILDERS)
+"""The sections of the dashboard, named after its properties."""
+
+_SECTION_DEPENDENCIES = {
+    "subjects": ("teachers",),
+    "teachers": ("subjects",),
+    "grades": ("periods", "subjects"),
+    "reminders": ("teachers",),
+    "homework": ("subjects",),
+    "register": ("periods", "grades", "reminders", "absences", "homework"),
+    "shared_files": ("teachers",),
+}
+
+
+def with_dependencies(sections: Iterable[str]) -> frozenset[str]:
+    """The given sections, plus the ones they are built from."""
+    todo = list(sections)
+    keep = set()
+    while todo:
+        section = todo.pop()
+        if section not in _SECTION_BUILDERS:
+            raise ValueError(f"Unknown dashboard section: {section!r}")
+
+        if section not in keep:
+            keep.add(section)
+            todo.extend(_SECTION_DEPENDENCIES.get(section, ()))
+
+    return frozenset(keep)
+
+
+def _intern(value: Any) -> Any:
+    # the same names and codes repeat across grades, days and accounts
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _period_lookup(periods: list[Period]) -> Callable[[date], Optional[Period]]:
+    """
+    Build a function returning the first period (in list order) containing a
+    date, by bisecting over the boundaries of all the periods.
+    """
+    # which periods contain a date only changes at these boundaries
+    bounds = sorted(
+        {p.start_date for p in periods}
+        | {p.end_date + timedelta(days=1) for p in periods}
+    )
+    owners = [
+        next((p for p in periods if p.start_date <= b <= p.end_date), None)
+        for b in bounds
+    ]
+
+    def find(date_: date) -> Optional[Period]:
+        i = bisect_right(bounds, date_) - 1
+        return owners[i] if i >= 0 else None
+
+    return find
+
+
+def _merge_events(old: list, delta: list) -> list:
+    merged = {entry["pk"]: entry for entry in old}
+    for entry in delta:
+        if entry.get("operazione") == "D":
+            merged.pop(entry["pk"], None)
+        else:
+            # updates keep their position, new entries go at the end
+            merged[entry["pk"]] = entry
+
+    return list(merged.values())
+
+
+def _merge_delta(
+    old: DashboardResponseDatum, delta: DashboardResponseDatum
+) -> DashboardResponseDatum:
+    merged: dict[str, Any] = dict(old)
+    for key, value in delta.items():
+        if key in _EVENT_SECTIONS:
+            merged[key] = _merge_events(old.get(key, []), value)  # type: ignore
+        elif key == "fileCondivisi":
+            files = dict(old.get("fileCondivisi", {}))
+            for k, v in value.items():  # type: ignore
+                if k == "listaFile":
+                    files[k] = _merge_events(files.get(k, []), v)
+                elif v:
+                    files[k] = v
+            merged[key] = files
+        elif isinstance(value, (list, dict)) and not value:
+            # empty lists mean nothing changed, not that everything is gone
+            continue
+        else:
+            merged[key] = value
+
+    return merged  # type: ignore
+
 
 class ItemAttachment:
-    def __init__(self, client, data: BachecaAllegato):
+    __slots__ = (
+        "__client",
+        "__endpoints",
+        "__pk",
+        "__filename",
+        "__description",
+        "__path",
+        "__url",
+    )
+
+    def __init__(
+        self, client, data: BachecaAllegato, endpoints: Optional[Endpoints] = None
+    ):
         from .client import DidUPClient
 
         self.__client: DidUPClient = client
-        self.__data = data
+        self.__endpoints = endpoints
+        # no need to keep the whole dict around
+        self.__pk = data["pk"]
+        self.__filename = data["nomeFile"]
+        self.__description = data["descrizioneFile"]
+        self.__path = data["path"]
+        self.__url = data["url"]
+
+    @property
+    def _endpoints(self) -> Endpoints:
+        return self.__endpoints or self.__client.endpoints
 
     @property
     def pk(self) -> str:
-        return self.__data["pk"]
+        return self.__pk
 
     @property
     def filename(self) -> str:
-        return self.__data["nomeFile"]
+        return self.__filename
 
     @property
     def description(self) -> str:
-        return self.__data["descrizioneFile"]
+        return self.__description
 
     @property
     def path(self) -> str:
-        return self.__data["path"]
+        return self.__path
 
     @property
     def url(self) -> str:
-        return self.__data["url"]
-
-    async def get_download_url(self) -> str:
-        resp = await self.__client.endpoints.download_allegato_bacheca(self.pk)
-        return resp["url"]  # type: ignore
-
-    async def download(self, fp: Union[BinaryIO, str]):
-        should_close = False
-        if isinstance(fp, str):
-            fp = open(fp, "wb")
-            should_close = True
-        elif not isinstance(
-            fp, (io.BytesIO, io.BufferedReader, io.RawIOBase, io.BufferedIOBase)
-        ):
-            raise TypeError("fp must be a file path or a binary file-like object")
+        return self.__url
 
-        url = await self.get_download_url()
+    async def get_download_url(self, refresh: bool = False) -> str:
+        return await self.__client.url_resolver.resolve(
+            self._endpoints, self.pk, refresh
+        )
 
-        # FIXME: seems like this is returning a 403 in a few cases
-        try:
-            async with self.__client.session.get(url) as response:
-                response.raise_for_status()
+    async def stream(
+        self, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> AsyncIterator[bytes]:
+        """
+        Download the attachment, yielding it in chunks of at most chunk_size
+        bytes as they arrive instead of buffering the whole file.
 
-                data = await response.read()
-                fp.write(data)
-        finally:
-            if should_close:
-                fp.close()
+        If the client has an attachment cache, the file is read from there
+        (and downloaded into it first, if needed).
+        """
+        cache = self.__client.attachment_cache
+        if cache is not None:
+            path = await cache.fetch(self, self.__client)
+            async for chunk in read_chunks(path, chunk_size):
+                yield chunk
+
+            return
+
+        url = await self.get_download_url()
+        try:
+            async for chunk in stream_url(self.__client.session, url, chunk_size):
+                yield chunk
+        except aiohttp.ClientResponseError as e:
+            # the URL expired, or the cached one was already too old to use
+            if e.status != 403:
+                raise
+
+            url = await self.get_download_url(refresh=True)
+            async for chunk in stream_url(self.__client.session, url, chunk_size):
+                yield chunk
+
+    async def download(
+        self, fp: Union[BinaryIO, str], chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> int:
+        """
+        Download the attachment to a file path or a binary file-like object,
+        returning its size in bytes.
+        """
+        return await write_chunks(self.stream(chunk_size), fp)
 
     def __repr__(self):
         ret = [f"<{type(self).__name__}"]
@@ -98,11 +270,37 @@ class ItemAttachment:
 
 
 class InboxItem:
-    def __init__(self, client, data: BachecaEntry):
+    __slots__ = (
+        "__client",
+        "__data",
+        "__endpoints",
+        "__pk",
+        "__message",
+        "__category",
+        "__author",
+        "__viewed",
+        "__confirmed",
+        "__date",
+        "__viewed_at",
+        "__expiration_date",
+        "__attachments",
+    )
+
+    def __init__(
+        self, client, data: BachecaEntry, endpoints: Optional[Endpoints] = None
+    ):
         from .client import DidUPClient
 
         self.__client: DidUPClient = client
-        self.__data = data
+        # only kept if asked to, so that mark_as_viewed can update it
+        self.__data = data if client.keep_raw else None
+        self.__endpoints = endpoints
+        self.__pk = data["pk"]
+        self.__message = data["messaggio"]
+        self.__category = _intern(data["categoria"])
+        self.__author = _intern(data["autore"])
+        self.__viewed = data["isPresaVisione"]
+        self.__confirmed = data["isPresaAdesioneConfermata"]
         self.__date = date.fromisoformat(data["data"])
         self.__viewed_at = (
             date.fromisoformat(data["dataConfermaPresaVisione"])
@@ -113,16 +311,16 @@ class InboxItem:
             date.fromisoformat(data["dataScadenza"]) if data["dataScadenza"] else None
         )
         self.__attachments = [
-            ItemAttachment(client, att) for att in data["listaAllegati"]
+            ItemAttachment(client, att, endpoints) for att in data["listaAllegati"]
         ]
 
     @property
     def pk(self) -> str:
-        return self.__data["pk"]
+        return self.__pk
 
     @property
     def message(self) -> str:
-        return self.__data["messaggio"]
+        return self.__message
 
     @property
     def expiration_date(self) -> date | None:
@@ -138,19 +336,19 @@ class InboxItem:
 
     @property
     def category(self) -> str:
-        return self.__data["categoria"]
+        return self.__category
 
     @property
     def author(self) -> str:
-        return self.__data["autore"]
+        return self.__author
 
     @property
     def viewed(self) -> bool:
-        return self.__data["isPresaVisione"]
+        return self.__viewed
 
     @property
     def confirmed(self) -> bool:
-        return self.__data["isPresaAdesioneConfermata"]
+        return self.__confirmed
 
     @property
     def attachments(self) -> list[ItemAttachment]:
@@ -158,9 +356,12 @@ class InboxItem:
 
     async def mark_as_viewed(self):
         if not self.viewed:
-            status = await self.__client.endpoints.presa_visione_adesione(self.pk, True)
+            endpoints = self.__endpoints or self.__client.endpoints
+            status = await endpoints.presa_visione_adesione(self.pk, True)
             # we could re-fetch the whole dashboard, but this is probably enough
-            self.__data["isPresaVisione"] = True
+            self.__viewed = True
+            if self.__data is not None:
+                self.__data["isPresaVisione"] = True
             return status
 
     def __repr__(self):
@@ -179,10 +380,13 @@ class InboxItem:
 
 
 class Dashboard:
-    def __init__(self, client):
+    def __init__(self, client, me=None):
         from .client import DidUPClient
+        from .me import Me
 
         self.client: DidUPClient = client
+        # the profile this dashboard belongs to
+        self.me: Me = me or client.me
         self.__data = None
         self.__subjects = None
         self.__teachers = None
@@ -197,131 +401,252 @@ class Dashboard:
         self.__homework = None
         self.__register = None
         self.__shared_files = None
+        self.__events = None
+        # sections are built on first access, and only if kept
+        self.__sections = (
+            frozenset(SECTIONS)
+            if client.dashboard_sections is None
+            else client.dashboard_sections
+        )
+        self.__built: set[str] = set()
+        # pk/shortcut-keyed indexes, rebuilt on every parse
+        self.__raw_subjects: dict[str, Materia] = {}
+        self.__raw_shortcuts: dict[str, str] = {}
+        self.__raw_teachers: dict[str, dict] = {}
+        self.__subject_details: dict[str, Optional[dict]] = {}
+        self.__subject_by_pk: dict[str, SubjectType] = {}
+        self.__subject_by_shortcut: dict[str, SubjectType] = {}
+        self.__teacher_by_pk: dict[str, Teacher] = {}
+        self.__period_by_pk: dict[str, Period] = {}
+        # reverse indexes, for the properties of subjects and periods
+        self.__grades_by_subject: Optional[dict[str, list[Grade]]] = None
+        self.__teachers_by_subject: Optional[dict[str, list[Teacher]]] = None
+        self.__grades_by_period: Optional[dict[str, list[Grade]]] = None
+        self.__register_by_period: Optional[dict[str, list[Day]]] = None
+        self.__last_update = None
+        self.__load_lock = asyncio.Lock()
+        # snapshot of the current data, taken when its changes are looked at
+        self.__snapshot: Optional[Snapshot] = None
+        # what we had before the last refresh, until its changes are computed
+        self.__previous: Union[Snapshot, DashboardResponseDatum, None] = None
+        self.__changes: Optional[list[ChangeEvent]] = []
+        self.__watchers: set[asyncio.Queue] = set()
+
+    @property
+    def loaded(self) -> bool:
+        return self.__data is not None
+
+    async def _ensure_loaded(self, restore: bool = False):
+        async with self.__load_lock:
+            if not self.loaded and not (restore and await self._restore()):
+                await self.fetch()
+
+        return self
+
+    def __await__(self):
+        if self.client.stale_while_revalidate:
+            return self.get().__await__()
+
+        return self._ensure_loaded().__await__()
+
+    @property
+    def age(self) -> Optional[timedelta]:
+        """How old the data is, None if it was never loaded."""
+        if self.__last_update is None:
+            return None
+
+        return datetime.now(timezone("Europe/Rome")) - self.__last_update
+
+    @property
+    def revalidating(self) -> bool:
+        return self.client.revalidating
+
+    def revalidate(self) -> asyncio.Task:
+        """
+        Refresh the data in the background. The current data stays available
+        until the new one is ready, and is kept if the refresh fails.
+
+        The dashboards of every profile of the account are refreshed together,
+        see DidUPClient.revalidate().
+        """
+        return self.client.revalidate()
+
+    async def get(self, max_age: float = 60.0):
+        """
+        Return the dashboard right away if we have data for it, even if only
+        from the snapshot store, revalidating it in the background if it is
+        older than max_age seconds. Otherwise wait for it to be downloaded.
+        """
+        await self._ensure_loaded(restore=True)
+        age = self.age
+        if age is None or age.total_seconds() > max_age:
+            self.revalidate()
+
+        return self
+
+    @property
+    def _snapshot_key(self) -> str:
+        index = self.client.profiles.index(self.me)
+        return f"{self.client.account_key}#{index}"
+
+    async def _restore_stale(self) -> bool:
+        """Make sure we have some data to serve, without downloading it."""
+        async with self.__load_lock:
+            return self.loaded or await self._restore()
+
+    async def _restore(self) -> bool:
+        """Load the last snapshot from the snapshot store, if any."""
+        store = self.client.snapshot_store
+        if store is None:
+            return False
+
+        snapshot = await store.load(self._snapshot_key)
+        if snapshot is None:
+            return False
+
+        self._parse(snapshot.data)
+        self.__last_update = snapshot.fetched_at
+        return True
+
+    async def _save_snapshot(self):
+        store = self.client.snapshot_store
+        if (
+            store is None
+            or not self.client.keep_raw
+            or self.__data is None
+            or self.__last_update is None
+        ):
+            return
+
+        await store.save(
+            self._snapshot_key,
+            DashboardSnapshot(data=self.__data, fetched_at=self.__last_update),
+        )
+
+    def _index(self, data: DashboardResponseDatum):
+        """Index the raw data by pk and shortcut, so that lookups are O(1)."""
+        self.__raw_subjects = {}
+        for subj in data["listaMaterie"]:
+            self.__raw_subjects.setdefault(subj["pk"], subj)
+
+        self.__raw_shortcuts = {}
+        for subj in data["listaMaterie"]:
+            self.__raw_shortcuts.setdefault(subj["abbreviazione"], subj["pk"])
+
+        self.__raw_teachers = {}
+        for teacher in data["listaDocentiClasse"]:
+            self.__raw_teachers.setdefault(teacher["pk"], teacher)
+
+        # the details of a subject are only found in its grades
+        self.__subject_details = {}
+        for grd in data["voti"]:
+            self.__subject_details.setdefault(
+                grd["pkMateria"], grd.get("materiaLight", None)
+            )
 
     def _get_subject(self, pk: str, data: Optional[DashboardResponseDatum] = None):
         if data is None or self.__subjects is None:
             if self.__data is None or self.__subjects is None:
-                raise ValueError("Dashboard data not filled. Log in first.")
-
-            data = self.__data
+                raise self._not_loaded()
 
-        subj = list(filter(lambda x: x.pk == pk, self.subjects))
-        if subj:
-            return subj[0]
-        else:
-            part_subj = list(filter(lambda x: x["pk"] == pk, data["listaMaterie"]))
-            if not part_subj:
-                return
-
-            part_subj = part_subj[0]
-
-            _avgs = data["mediaMaterie"].get(pk, {})
-            avgs = SubjectAverages(
-                oral=SubjectGrades(
-                    sum=_avgs.get("sommaValutazioniOrale", 0.0),
-                    num=_avgs.get("numValutazioniOrale", 0),
-                    avg=_avgs.get("mediaOrale", 0.0),
-                ),
-                written=SubjectGrades(
-                    sum=_avgs.get("sommaValutazioniScritto", 0.0),
-                    num=_avgs.get("numValutazioniScritto", 0),
-                    avg=_avgs.get("mediaScritta", 0.0),
-                ),
-                total=SubjectGrades(
-                    sum=_avgs.get("sumValori", 0.0),
-                    num=_avgs.get("numValori", 0),
-                    avg=_avgs.get("mediaMateria", 0.0),
-                ),
-                grades=_avgs.get("numVoti", 0),
-            )
+        subj = self.__subject_by_pk.get(pk)
+        if subj is not None:
+            return subj
 
-            def _(ps: Materia):
-                return PartialSubject(
-                    dashboard=self,
-                    shortcut=ps["abbreviazione"],
-                    scrutinizable=ps["scrut"],
-                    type=ps["codTipo"],
-                    counts_towards_avg=ps["faMedia"],
-                    name=ps["materia"],
-                    pk=ps["pk"],
-                    averages=avgs,
-                )
+        part_subj = self.__raw_subjects.get(pk)
+        if part_subj is None:
+            return
+
+        _avgs = self.__data["mediaMaterie"].get(pk, {})
+        avgs = SubjectAverages(
+            oral=SubjectGrades(
+                sum=_avgs.get("sommaValutazioniOrale", 0.0),
+                num=_avgs.get("numValutazioniOrale", 0),
+                avg=_avgs.get("mediaOrale", 0.0),
+            ),
+            written=SubjectGrades(
+                sum=_avgs.get("sommaValutazioniScritto", 0.0),
+                num=_avgs.get("numValutazioniScritto", 0),
+                avg=_avgs.get("mediaScritta", 0.0),
+            ),
+            total=SubjectGrades(
+                sum=_avgs.get("sumValori", 0.0),
+                num=_avgs.get("numValori", 0),
+                avg=_avgs.get("mediaMateria", 0.0),
+            ),
+            grades=_avgs.get("numVoti", 0),
+        )
 
-            # try finding it from the grades
-            sub = list(
-                filter(lambda x: x["pkMateria"] == part_subj["pk"], data["voti"])
+        sub = self.__subject_details.get(pk)
+        if sub:
+            subj = Subject(
+                dashboard=self,
+                shortcut=_intern(part_subj["abbreviazione"]),
+                scrutinizable=part_subj["scrut"],
+                type=_intern(part_subj["codTipo"]),
+                counts_towards_avg=part_subj["faMedia"],
+                name=_intern(part_subj["materia"]),
+                pk=part_subj["pk"],
+                code=_intern(sub["codMateria"]),
+                ministerial_code=_intern(sub["codMinisteriale"]),
+                description=sub.get("descrizione", None),
+                has_failing_grades=sub["conInsufficienze"],
+                has_individual_lessons=sub["lezioniIndividuali"],
+                full_name=_intern(sub["codEDescrizioneMateria"]),
+                kind=_intern(sub["tipo"]),
+                id=_intern(sub["idmateria"]),
+                averages=avgs,
+            )
+        else:
+            subj = PartialSubject(
+                dashboard=self,
+                shortcut=_intern(part_subj["abbreviazione"]),
+                scrutinizable=part_subj["scrut"],
+                type=_intern(part_subj["codTipo"]),
+                counts_towards_avg=part_subj["faMedia"],
+                name=_intern(part_subj["materia"]),
+                pk=part_subj["pk"],
+                averages=avgs,
             )
-            if sub:
-                sub = sub[0].get("materiaLight", None)
-                if sub:
-                    subj = Subject(
-                        dashboard=self,
-                        shortcut=part_subj["abbreviazione"],
-                        scrutinizable=part_subj["scrut"],
-                        type=part_subj["codTipo"],
-                        counts_towards_avg=part_subj["faMedia"],
-                        name=part_subj["materia"],
-                        pk=part_subj["pk"],
-                        code=sub["codMateria"],
-                        ministerial_code=sub["codMinisteriale"],
-                        description=sub.get("descrizione", None),
-                        has_failing_grades=sub["conInsufficienze"],
-                        has_individual_lessons=sub["lezioniIndividuali"],
-                        full_name=sub["codEDescrizioneMateria"],
-                        kind=sub["tipo"],
-                        id=sub["idmateria"],
-                        averages=avgs,
-                    )
-                else:
-                    subj = _(part_subj)
-            else:
-                subj = _(part_subj)
 
-            self.__subjects.append(subj)
-            return subj
+        self.__subjects.append(subj)
+        self.__subject_by_pk[pk] = subj
+        self.__subject_by_shortcut.setdefault(subj.shortcut, subj)
+        return subj
 
     def _get_subject_from_shortcut(
         self, shortcut: str, data: Optional[DashboardResponseDatum] = None
     ):
         # probably not the best way to do this, but oh well this is what argo gives me
-        if data is None:
-            if self.__data is None:
-                raise ValueError("Dashboard data not filled. Log in first.")
+        if data is None and self.__data is None:
+            raise self._not_loaded()
 
-            data = self.__data
+        subj = self.__subject_by_shortcut.get(shortcut)
+        if subj is not None:
+            return subj
 
-        subj = list(filter(lambda x: x.shortcut == shortcut, self.subjects))
-        if subj:
-            return subj[0]
-        else:
-            part_subj = list(
-                filter(lambda x: x["abbreviazione"] == shortcut, data["listaMaterie"])
-            )
-            if not part_subj:
-                return
+        pk = self.__raw_shortcuts.get(shortcut)
+        if pk is None:
+            return
 
-            part_subj = part_subj[0]
-            return self._get_subject(part_subj["pk"], data)
+        return self._get_subject(pk, data)
 
     def _get_teacher(
         self, pk: str, data: Optional[DashboardResponseDatum] = None
     ) -> Teacher:
         if data is None or self.__teachers is None:
             if self.__data is None or self.__teachers is None:
-                raise ValueError("Dashboard data not filled. Log in first.")
+                raise self._not_loaded()
 
-            data = self.__data
+        ret = self.__teacher_by_pk.get(pk)
+        if ret is not None:
+            return ret
 
-        teacher = list(filter(lambda x: x.pk == pk, self.teachers))
-        if teacher:
-            return teacher[0]
-
-        teacher = list(filter(lambda x: x["pk"] == pk, data["listaDocentiClasse"]))
-        if not teacher:
+        teacher = self.__raw_teachers.get(pk)
+        if teacher is None:
             return PartialTeacher(pk=pk, name="Unknown")  # to be typed properly
             # raise ValueError(f"Teacher with pk {pk} not found")
 
-        teacher = teacher[0]
         subjects = []
         for shortcut in teacher["materie"]:
             subj = self._get_subject_from_shortcut(shortcut, data)
@@ -334,29 +659,248 @@ class Dashboard:
 
         ret = Teacher(
             pk=teacher["pk"],
-            first_name=teacher["desNome"],
-            last_name=teacher["desCognome"],
-            email=teacher["desEmail"],
+            first_name=_intern(teacher["desNome"]),
+            last_name=_intern(teacher["desCognome"]),
+            email=_intern(teacher["desEmail"]),
             subjects=subjects,
         )
 
         self.__teachers.append(ret)
+        self.__teacher_by_pk[pk] = ret
 
         return ret
 
-    async def fetch(self):
-        data = (await self.client.endpoints.dashboard())["data"]["dati"]
-        new = list(filter(lambda x: x["pk"] == self.client.me.user_pk, data))
-        if new:
-            self.__data = new[0]
+    @property
+    def last_update(self) -> Optional[datetime]:
+        """When the data was last requested from the server."""
+        return self.__last_update
+
+    async def fetch(self, incremental: bool = False):
+        """
+        Fetch the dashboard.
+
+        With incremental, only the changes since the last fetch are requested
+        and merged into the current data, unless the server asks for a full reload.
+        """
+        await self._fetch(incremental)
+        await self._save_snapshot()
+        return self
+
+    async def _fetch(self, incremental: bool = False):
+        now = datetime.now(timezone("Europe/Rome"))
+        self._clear_changes()
+        if incremental and self._can_merge():
+            payload = await self.me.endpoints.dashboard(self.__last_update)
+            if self._merge(payload, now):
+                return self
+
+        return self._load(await self.me.endpoints.dashboard(), now)
+
+    def _clear_changes(self):
+        # a refresh without news must not report the previous one again
+        self.__changes = []
+        self.__previous = None
+
+    def _can_merge(self) -> bool:
+        """Whether an incremental response can be merged into the current data."""
+        return (
+            self.client.keep_raw
+            and self.__data is not None
+            and self.__last_update is not None
+        )
+
+    def _merge(self, payload: DashboardResponse, fetched_at: datetime) -> bool:
+        """
+        Merge an incremental dashboard response into the current data.
+        Returns False if the server asks for a full reload instead.
+        """
+        delta = list(
+            filter(
+                lambda x: x["pk"] == self.__data["pk"],  # type: ignore
+                payload["data"]["dati"],
+            )
+        )
+        if not delta:
+            # nothing changed for this profile
+            self.__last_update = fetched_at
+            return True
+
+        delta = delta[0]
+        if delta.get("ricaricaDati") or delta.get("rimuoviDatiLocali"):
+            return False
+
+        self._parse(_merge_delta(self.__data, delta))  # type: ignore
+        self.__last_update = fetched_at
+        return True
+
+    def _find(self, payload: DashboardResponse) -> Optional[DashboardResponseDatum]:
+        """The data of this profile in a full dashboard response, if any."""
+        data = payload["data"]["dati"]
+        # the dashboard holds the data of every profile of the account
+        for datum in data:
+            if datum["pk"] == self.me.user_pk:
+                return datum
+
+        if data and len(self.client.profiles) == 1:
+            # not sure, but at least we have something, and it can't be
+            # someone else's when there is no one else
+            return data[0]
+
+        return None
+
+    def _load(self, payload: DashboardResponse, fetched_at: Optional[datetime] = None):
+        """
+        Load the data from a full dashboard response. fetched_at should be
+        the time the request was sent.
+        """
+        datum = self._find(payload)
+        if datum is None:
+            raise DidUPyError(
+                f"The dashboard has no data for the profile {self.me.user_pk}."
+            )
+
+        self.__last_update = fetched_at or datetime.now(timezone("Europe/Rome"))
+        return self._parse(datum)
+
+    def _parse(self, data: DashboardResponseDatum):
+        # sections are only built to compute the changes once someone asks
+        # for them, until then it's enough to remember the raw data we had
+        if not self.loaded:
+            previous = None
+        elif self.__snapshot is not None:
+            previous = self.__snapshot
+        elif not self.client.keep_raw:
+            # no raw data to build them from later, but they are built already
+            previous = Snapshot.of(self)
         else:
-            # not sure, but at least we have something
-            # if this is correct, then we should use this
-            # to implement multi-account support
-            self.__data = data[0]
+            previous = self.__data
+
+        self._build(data)
+        self.__snapshot = None
+        self.__previous = previous
+        self.__changes = None if previous is not None else []
+
+        # watchers want the changes right away
+        for queue in self.__watchers:
+            for event in self.changes:
+                queue.put_nowait(event)
+
+        return self
+
+    @property
+    def changes(self) -> list[ChangeEvent]:
+        """What changed with the last refresh (nothing after the first one)."""
+        if self.__changes is None:
+            previous = self.__previous
+            if not isinstance(previous, Snapshot):
+                old = Dashboard(self.client, self.me)
+                old._build(previous)  # type: ignore # pylint: disable=protected-access
+                previous = Snapshot.of(old)
+
+            self.__snapshot = Snapshot.of(self)
+            self.__changes = diff(previous, self.__snapshot)
+            self.__previous = None
+
+        return self.__changes
+
+    async def change_feed(self) -> AsyncIterator[ChangeEvent]:
+        """
+        Yield the changes of every refresh from now on.
+
+        ```
+        async for event in dashboard.change_feed():
+            if isinstance(event, GradeAdded):
+                ...
+        ```
+        """
+        queue: asyncio.Queue[ChangeEvent] = asyncio.Queue()
+        self.__watchers.add(queue)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self.__watchers.discard(queue)
+
+    def _build(self, data: DashboardResponseDatum):
+        """
+        Start over with new data. Sections are built from it on first access,
+        or right away (and the raw data dropped) if the client doesn't keep it.
+        """
+        self.__data = data
+        self._index(data)
+        self.__built = set()
+        self.__periods = None
+        self.__period_by_pk = {}
+        self.__subjects = None
+        self.__teachers = None
+        self.__grades = None
+        self.__options = None
+        self.__other_options = None
+        self.__inbox = None
+        self.__reminders = None
+        self.__absences = None
+        self.__homework = None
+        self.__events = None
+        self.__register = None
+        self.__out_of_class = None
+        self.__shared_files = None
+        self.__grades_by_subject = None
+        self.__teachers_by_subject = None
+        self.__grades_by_period = None
+        self.__register_by_period = None
+
+        if not self.client.keep_raw:
+            for section in self.__sections:
+                self._materialize(section)
+
+            self._drop_raw()
+
+        return self
+
+    def _shows(self, section: str) -> bool:
+        # non-empty sections only, like before they were built lazily
+        return self.loaded and self._keeps(section) and bool(getattr(self, section))
+
+    def _not_loaded(self) -> ValueError:
+        if self.client.lazy_dashboard:
+            # logged in, but the dashboard is only downloaded when asked for
+            return ValueError(
+                "Dashboard not loaded yet. Await 'client.me.dashboard' "
+                "or call 'load_dashboard()' first."
+            )
+
+        return ValueError("Dashboard data not filled. Log in first.")
+
+    def _keeps(self, section: str) -> bool:
+        return section in self.__sections
+
+    def _materialize(self, section: str):
+        """Build a section from the raw data, unless it was already built."""
+        if section in self.__built:
+            return
+
+        if self.__data is None:
+            raise self._not_loaded()
 
-        data = self.__data  # for easier access
+        if section not in self.__sections:
+            raise ValueError(
+                f"The {section} section is not kept, see DidUPClient(dashboard_sections=...)."
+            )
+
+        getattr(self, _SECTION_BUILDERS[section])(self.__data)
+
+    def _drop_raw(self):
+        """Forget the raw data, except for what the properties still read."""
+        data = self.__data
+        self.__data = {
+            k: data[k] for k in ("pk", "mediaGenerale", "mediaPerMese") if k in data
+        }
+        self.__raw_subjects = {}
+        self.__raw_shortcuts = {}
+        self.__raw_teachers = {}
+        self.__subject_details = {}
 
+    def _build_periods(self, data: DashboardResponseDatum):
         self.__periods = []
         for period in data["listaPeriodi"]:
             avg = data.get("mediaPerPeriodo", {}).get(period["codPeriodo"], {})
@@ -367,14 +911,14 @@ class Dashboard:
                     start_date=date.fromisoformat(
                         period.get("datInizio") or period.get("dataInizio")
                     ),
-                    name=period["descrizione"],
+                    name=_intern(period["descrizione"]),
                     one_grade=period["votoUnico"],
                     avg=period["mediaScrutinio"],
                     is_avg=period["isMediaScrutinio"],
                     end_date=date.fromisoformat(
                         period.get("datFine") or period.get("dataFine")
                     ),
-                    code=period["codPeriodo"],
+                    code=_intern(period["codPeriodo"]),
                     is_final=period["isScrutinioFinale"],
                     average=avg.get("mediaGenerale", 0.0),
                     monthly_averages=avg.get("mediaMese", {}),
@@ -402,10 +946,73 @@ class Dashboard:
                 )
             )
 
-        self.__teachers = []
+        self.__period_by_pk = {}
+        for period in self.__periods:
+            self.__period_by_pk.setdefault(period.pk, period)
+
+        for grd in data["voti"]:
+            # the same grades the grades section skips
+            if grd["pkMateria"] not in self.__raw_subjects or not grd["pkDocente"]:
+                continue
+
+            if grd["pkPeriodo"] not in self.__period_by_pk:
+                # i don't know why but argo DOES send grades with unknown periods
+                period = Period(
+                    dashboard=self,
+                    pk=grd["pkPeriodo"],
+                    start_date=date.fromisoformat("1970-01-01"),
+                    name="Unknown",
+                    one_grade=False,
+                    avg=0.0,
+                    is_avg=False,
+                    end_date=date.fromisoformat("1970-01-01"),
+                    code="UNK",
+                    is_final=False,
+                    average=0.0,
+                    monthly_averages={},
+                    subject_averages={},
+                )
+                self.__periods.append(period)
+                self.__period_by_pk[period.pk] = period
+
+        self.__built.add("periods")
+
+    def _build_entities(self, data: DashboardResponseDatum):
         self.__subjects = []
-        self.__grades = []
+        self.__teachers = []
+        self.__subject_by_pk = {}
+        self.__subject_by_shortcut = {}
+        self.__teacher_by_pk = {}
 
+        # in the order they are first met in the grades
+        for grd in data["voti"]:
+            if (
+                self._get_subject(grd["pkMateria"], data) is not None
+                and grd["pkDocente"]
+            ):
+                self._get_teacher(grd["pkDocente"], data)
+
+        # the ones without grades
+        for subj in data["listaMaterie"]:
+            self._get_subject(subj["pk"], data)
+
+        for teacher in data["listaDocentiClasse"]:
+            self._get_teacher(teacher["pk"], data)
+
+        self.__teachers_by_subject = {}
+        for teacher in self.__teachers:
+            # a teacher is listed once per subject, even if it's there twice
+            pks = {s.pk for s in teacher.subjects if isinstance(s, PartialSubject)}
+            for pk in pks:
+                self.__teachers_by_subject.setdefault(pk, []).append(teacher)
+
+        self.__built.update(("subjects", "teachers"))
+
+    def _build_grades(self, data: DashboardResponseDatum):
+        self._materialize("periods")
+        self._materialize("subjects")
+
+        self.__grades = []
         for grd in data["voti"]:
             subj = self._get_subject(grd["pkMateria"], data)
             if subj is None:
@@ -419,36 +1026,15 @@ class Dashboard:
                 # don't think this is gonna happen
                 continue
 
-            period = list(filter(lambda x: x.pk == grd["pkPeriodo"], self.periods))
-            if not period:
-                # i don't know why but argo DOES send grades with unknown periods
-                period = [
-                    Period(
-                        dashboard=self,
-                        pk=grd["pkPeriodo"],
-                        start_date=date.fromisoformat("1970-01-01"),
-                        name="Unknown",
-                        one_grade=False,
-                        avg=0.0,
-                        is_avg=False,
-                        end_date=date.fromisoformat("1970-01-01"),
-                        code="UNK",
-                        is_final=False,
-                        average=0.0,
-                        monthly_averages={},
-                        subject_averages={},
-                    )
-                ]
-                self.__periods += period
-
+            period = self.__period_by_pk[grd["pkPeriodo"]]
             self.__grades.append(
                 Grade(
                     pk=grd["pk"],
                     created_at=date.fromisoformat(grd["datEvento"]),
                     date=date.fromisoformat(grd["datGiorno"]),
-                    period=period.pop(),
-                    label=grd["codCodice"],
-                    big_label=grd["descrizioneVoto"],
+                    period=period,
+                    label=_intern(grd["codCodice"]),
+                    big_label=_intern(grd["descrizioneVoto"]),
                     value=grd["valore"],
                     subject=subj,
                     description=grd["descrizioneProva"],
@@ -458,16 +1044,17 @@ class Dashboard:
                 )
             )
 
-        for subj in data["listaMaterie"]:
-            pk = subj["pk"]
-            if not any(s.pk == pk for s in self.subjects):
-                self._get_subject(pk, data)
+        self.__grades_by_subject = {}
+        self.__grades_by_period = {}
+        for g in self.__grades:
+            if isinstance(g.subject, PartialSubject):
+                self.__grades_by_subject.setdefault(g.subject.pk, []).append(g)
 
-        for teacher in data["listaDocentiClasse"]:
-            pk = teacher["pk"]
-            if not any(t.pk == pk for t in self.teachers):
-                self._get_teacher(pk, data)
+            self.__grades_by_period.setdefault(g.period.pk, []).append(g)
 
+        self.__built.add("grades")
+
+    def _build_options(self, data: DashboardResponseDatum):
         kwargs = {}
         opts = {}
         annotations = DashboardOptions.__annotations__.copy()
@@ -484,8 +1071,17 @@ class Dashboard:
 
         self.__options = DashboardOptions(**kwargs)
         self.__other_options = opts
+        self.__built.add("options")
+
+    def _build_inbox(self, data: DashboardResponseDatum):
+        self.__inbox = [
+            InboxItem(self.client, entry, self.me.endpoints)
+            for entry in data["bacheca"]
+        ]
+        self.__built.add("inbox")
 
-        self.__inbox = [InboxItem(self.client, entry) for entry in data["bacheca"]]
+    def _build_reminders(self, data: DashboardResponseDatum):
+        self._materialize("teachers")
 
         self.__reminders = [
             Reminder(
@@ -498,16 +1094,18 @@ class Dashboard:
             )
             for rem in data.get("promemoria", [])
         ]
+        self.__built.add("reminders")
 
+    def _build_absences(self, data: DashboardResponseDatum):
         self.__absences = [
             AbsenceEvent(
                 pk=absc["pk"],
                 date=date.fromisoformat(absc["data"]),
                 type=AbsenceType(absc["codEvento"]),
                 justifiable=absc["daGiustificare"],
-                teacher_name=absc["docente"] or "",
+                teacher_name=_intern(absc["docente"] or ""),
                 note=absc["nota"] or "",
-                description=absc["descrizione"] or "",
+                description=_intern(absc["descrizione"] or ""),
                 justification=(
                     Justification(
                         date=date.fromisoformat(absc["dataGiustificazione"]),
@@ -519,22 +1117,26 @@ class Dashboard:
             )
             for absc in data.get("appello", [])
         ]
+        self.__built.add("absences")
+
+    def _build_homework(self, data: DashboardResponseDatum):
+        """Build the homework and the register events, which come together."""
+        self._materialize("subjects")
 
         self.__homework = []
 
-        events = {}
+        self.__events = {}
         for item in data["registro"]:
-            _date = item["datGiorno"]
             teacher = self._get_teacher(item["pkDocente"], data)
             subject = self._get_subject(item["pkMateria"], data)
-            date_ = date.fromisoformat(_date)
+            date_ = date.fromisoformat(item["datGiorno"])
             hw = [
                 HomeworkAssigned(
                     text=h["compito"],
                     date=date_,
                     due_date=date.fromisoformat(h["dataConsegna"]),
                     teacher=teacher,
-                    subject=subject if subject else item["materia"],
+                    subject=subject if subject else _intern(item["materia"]),
                 )
                 for h in item.get("compiti", [])
             ]
@@ -543,7 +1145,7 @@ class Dashboard:
                 pk=item["pk"],
                 date=date_,
                 teacher=teacher,
-                subject=subject if subject else item["materia"],
+                subject=subject if subject else _intern(item["materia"]),
                 url=item.get("url", None),
                 activity=item["attivita"],
                 signed=item["isFirmato"],
@@ -552,62 +1154,81 @@ class Dashboard:
             )
 
             self.__homework.extend(hw)
-            if _date not in events:
-                events[_date] = []
+            if date_ not in self.__events:
+                self.__events[date_] = []
 
-            events[_date].append(evt)
+            self.__events[date_].append(evt)
 
-        self.__register = []
-        dates = set(events.keys())
+        self.__built.add("homework")
+
+    def _build_register(self, data: DashboardResponseDatum):
+        for section in ("periods", "grades", "reminders", "absences", "homework"):
+            self._materialize(section)
+
+        # group everything by day in one pass per collection
+        grades = {}
         for g in self.grades:
-            dates.add(g.date.isoformat())
+            grades.setdefault(g.date, []).append(g)
 
+        reminders = {}
         for r in self.reminders:
-            dates.add(r.date.isoformat())
+            reminders.setdefault(r.date, []).append(r)
 
+        absences = {}
         for absence in self.absences:
-            dates.add(absence.date.isoformat())
+            absences.setdefault(absence.date, absence)
 
+        homework = {}
         for hw in self.homework:
-            dates.add(hw.due_date.isoformat())
+            homework.setdefault(hw.due_date, []).append(hw)
 
-        for _date in dates:
-            date_ = date.fromisoformat(_date)
-            period = list(
-                filter(lambda x: x.start_date <= date_ <= x.end_date, self.periods)
-            )
-            if not period:
+        find_period = _period_lookup(self.periods)
+        self.__register = []
+        for date_ in sorted(
+            self.__events.keys()
+            | grades.keys()
+            | reminders.keys()
+            | absences.keys()
+            | homework.keys()
+        ):
+            period = find_period(date_)
+            if period is None:
                 continue
 
-            period = period[0]
-            absence = list(filter(lambda x: x.date == date_, self.absences))
-            absence = absence[0] if absence else None
-
             self.__register.append(
                 Day(
                     date=date_,
                     period=period,
-                    absence=absence,
-                    grades=[g for g in self.grades if g.date == date_],
-                    reminders=[r for r in self.reminders if r.date == date_],
-                    events=events.get(_date, []),
-                    homework=[hw for hw in self.homework if hw.due_date == date_],
+                    absence=absences.get(date_),
+                    grades=grades.get(date_, []),
+                    reminders=reminders.get(date_, []),
+                    events=self.__events.get(date_, []),
+                    homework=homework.get(date_, []),
                 )
             )
 
-        self.__register.sort(key=lambda x: x.date)
+        self.__register_by_period = {}
+        for day in self.__register:
+            self.__register_by_period.setdefault(day.period.pk, []).append(day)
+
+        self.__built.add("register")
 
+    def _build_out_of_class(self, data: DashboardResponseDatum):
         self.__out_of_class = [
             OutOfClass(
                 pk=evt["pk"],
                 date=date.fromisoformat(evt["data"]),
                 note=evt["nota"],
-                teacher_name=evt["docente"],
-                description=evt["descrizione"],
+                teacher_name=_intern(evt["docente"]),
+                description=_intern(evt["descrizione"]),
                 online=evt["frequenzaOnLine"],
             )
             for evt in data.get("fuoriClasse", [])
         ]
+        self.__built.add("out_of_class")
+
+    def _build_shared_files(self, data: DashboardResponseDatum):
+        self._materialize("teachers")
 
         self.__shared_files = [
             SharedFile(
@@ -622,106 +1243,105 @@ class Dashboard:
             )
             for f in data.get("fileCondivisi", {}).get("listaFile", [])
         ]
-
-        return self
+        self.__built.add("shared_files")
 
     @property
     def options(self) -> DashboardOptions:
-        if self.__options is None:
-            raise ValueError("Dashboard data not filled. Log in first.")
-
+        self._materialize("options")
         return self.__options
 
     @property
     def other_options(self) -> dict[str, bool]:
-        if self.__other_options is None:
-            raise ValueError("Dashboard data not filled. Log in first.")
-
+        self._materialize("options")
         return self.__other_options
 
     @property
     def grades_general_avg(self) -> float:
         if self.__data is None:
-            raise ValueError("Dashboard data not filled. Log in first.")
+            raise self._not_loaded()
 
         return self.__data["mediaGenerale"]
 
     @property
     def grades_monthly_avg(self) -> list[float]:
         if self.__data is None:
-            raise ValueError("Dashboard data not filled. Log in first.")
+            raise self._not_loaded()
 
         avg = self.__data["mediaPerMese"]
         return list(avg.values())
 
     @property
     def subjects(self) -> list[SubjectType]:
-        if self.__subjects is None:
-            raise ValueError("Dashboard data not filled. Log in first.")
-
+        self._materialize("subjects")
         return self.__subjects
 
     @property
     def periods(self) -> list[Period]:
-        if self.__periods is None:
-            raise ValueError("Dashboard data not filled. Log in first.")
-
+        self._materialize("periods")
         return self.__periods
 
     @property
     def inbox(self) -> list[InboxItem]:
-        if self.__inbox is None:
-            raise ValueError("Dashboard data not filled. Log in first.")
-
+        self._materialize("inbox")
         return self.__inbox
 
     @property
     def reminders(self) -> list[Reminder]:
-        if self.__reminders is None:
-            raise ValueError("Dashboard data not filled. Log in first.")
-
+        self._materialize("reminders")
         return self.__reminders
 
     @property
     def shared_files(self) -> list[SharedFile]:
-        if self.__shared_files is None:
-            raise ValueError("Dashboard data not filled. Log in first.")
-
+        self._materialize("shared_files")
         return self.__shared_files
 
     @property
     def grades(self) -> list[Grade]:
-        if self.__grades is None:
-            raise ValueError("Dashboard data not filled. Log in first.")
-
+        self._materialize("grades")
         return self.__grades
 
     @property
     def teachers(self) -> list[Teacher]:
-        if self.__teachers is None:
-            raise ValueError("Dashboard data not filled. Log in first.")
-
+        self._materialize("teachers")
         return self.__teachers
 
     @property
-    def absences(self) -> list[AbsenceEvent]:
-        if self.__absences is None:
-            raise ValueError("Dashboard data not filled. Log in first.")
+    def grades_by_subject(self) -> dict[str, list[Grade]]:
+        """The grades of each subject, by subject pk."""
+        self._materialize("grades")
+        return self.__grades_by_subject
 
+    @property
+    def teachers_by_subject(self) -> dict[str, list[Teacher]]:
+        """The teachers of each subject, by subject pk."""
+        self._materialize("teachers")
+        return self.__teachers_by_subject
+
+    @property
+    def grades_by_period(self) -> dict[str, list[Grade]]:
+        """The grades of each period, by period pk."""
+        self._materialize("grades")
+        return self.__grades_by_period
+
+    @property
+    def register_by_period(self) -> dict[str, list[Day]]:
+        """The days of the register in each period, by period pk."""
+        self._materialize("register")
+        return self.__register_by_period
+
+    @property
+    def absences(self) -> list[AbsenceEvent]:
+        self._materialize("absences")
         return self.__absences
 
     @property
     def out_of_class(self) -> list[OutOfClass]:
-        if self.__out_of_class is None:
-            raise ValueError("Dashboard data not filled. Log in first.")
-
+        self._materialize("out_of_class")
         return self.__out_of_class
 
     @property
     def homework(self) -> list[HomeworkAssigned]:
-        if self.__homework is None:
-            raise ValueError("Dashboard data not filled. Log in first.")
-
+        self._materialize("homework")
         return self.__homework
 
     @property
@@ -736,17 +1356,15 @@ class Dashboard:
 
     @property
     def register(self) -> list[Day]:
-        if self.__register is None:
-            raise ValueError("Dashboard data not filled. Log in first.")
-
+        self._materialize("register")
         return self.__register
 
     def __repr__(self):
         ret = [f"<{type(self).__name__}"]
         props = {
-            "subjects": len(self.subjects) if self.__subjects else None,
-            "periods": len(self.periods) if self.__periods else None,
-            "inbox_items": len(self.inbox) if self.__inbox else None,
+            "subjects": len(self.subjects) if self._shows("subjects") else None,
+            "periods": len(self.periods) if self._shows("periods") else None,
+            "inbox_items": len(self.inbox) if self._shows("inbox") else None,
             "grades_general_avg": self.grades_general_avg if self.__data else None,
         }
         for k, v in props.items():
@@ -1,13 +1,18 @@
 from __future__ import annotations
 
+import posixpath
 from enum import Enum
+from urllib.parse import urlsplit
 from dataclasses import dataclass
-from typing import Tuple, Any
-from datetime import date as Date, time
+from typing import Tuple, Any, Generic, TypeVar
+from datetime import date as Date, time, datetime
 from typing import Union, Optional, Sequence, TYPE_CHECKING
 
 if TYPE_CHECKING:
-    from .dashboard import Dashboard
+    from .client import DidUPClient
+    from .dashboard import Dashboard, InboxItem
+
+T = TypeVar("T")
 
 
 class AbsenceType(Enum):
@@ -21,19 +26,47 @@ def _make_repr(self, **kwargs) -> str:
     return f"{type(self).__name__}({args})"
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class CommonObject:
     pk: str
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
+class TokenData:
+    token: str
+    refresh_token: Optional[str]
+    expires_at: datetime
+    mobile_login: dict
+    """Raw response of the mobile login, holding the X-Auth-Token of each profile"""
+
+
+@dataclass(frozen=True, slots=True)
+class DashboardSnapshot:
+    data: dict
+    """Raw dashboard data of a single profile"""
+
+    fetched_at: datetime
+
+
+@dataclass(frozen=True, slots=True)
+class PoolResult(Generic[T]):
+    client: "DidUPClient"
+    result: Optional[T]
+    error: Optional[Exception]
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass(frozen=True, slots=True)
 class SubjectGrades:
     num: int
     sum: float
     avg: float
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class SubjectAverages:
     oral: SubjectGrades
     written: SubjectGrades
@@ -56,7 +89,7 @@ class SubjectAverages:
         )
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class SchoolData(CommonObject):
     name: str
     year: Tuple[Date, Date]
@@ -65,14 +98,14 @@ class SchoolData(CommonObject):
     course: str
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class UserResidenceData:
     address: str
     postal_code: str
     city: str
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class UserData(CommonObject):
     last_class: bool
     full_name: str
@@ -89,7 +122,7 @@ class UserData(CommonObject):
     residence: UserResidenceData
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class ProfileOptions:
     orario_scolastico: bool = False
     pagellino_online: bool = False
@@ -133,7 +166,7 @@ class ProfileOptions:
     consiglio_di_classe: bool = False
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class DashboardOptions(ProfileOptions):
     invalsi: bool = False
     pfi: bool = False
@@ -141,12 +174,12 @@ class DashboardOptions(ProfileOptions):
     wsm: bool = False
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class PartialTeacher(CommonObject):
     name: str
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Teacher(CommonObject):
     first_name: str
     last_name: str
@@ -168,7 +201,7 @@ class Teacher(CommonObject):
         return self.full_name
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class PartialSubject(CommonObject):
     shortcut: str
     scrutinizable: bool
@@ -190,27 +223,11 @@ class PartialSubject(CommonObject):
 
     @property
     def grades(self) -> Sequence["Grade"]:
-        full = self.dashboard.grades
-
-        return list(
-            filter(
-                lambda g: isinstance(g.subject, PartialSubject)
-                and g.subject.pk == self.pk,
-                full,
-            )
-        )
+        return self.dashboard.grades_by_subject.get(self.pk, [])
 
     @property
     def teachers(self) -> Sequence[Teacher]:
-        full = self.dashboard.teachers
-        ret = []
-        for teacher in full:
-            for subject in teacher.subjects:
-                if isinstance(subject, PartialSubject) and subject.pk == self.pk:
-                    ret.append(teacher)
-                    break
-
-        return ret
+        return self.dashboard.teachers_by_subject.get(self.pk, [])
 
     def average_for_period(
         self, period: Union["Period", str]
@@ -233,7 +250,7 @@ class PartialSubject(CommonObject):
         return per.subject_averages.get(self.pk)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Subject(PartialSubject):
     code: str
     ministerial_code: str
@@ -256,7 +273,7 @@ class Subject(PartialSubject):
         return self.full_name
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Period(CommonObject):
     start_date: Date
     name: str
@@ -294,15 +311,11 @@ class Period(CommonObject):
 
     @property
     def grades(self) -> Sequence["Grade"]:
-        full = self.dashboard.grades
-
-        return [grade for grade in full if grade.period.pk == self.pk]
+        return self.dashboard.grades_by_period.get(self.pk, [])
 
     @property
     def register(self) -> Sequence["Day"]:
-        full = self.dashboard.register
-
-        return [day for day in full if day.period.pk == self.pk]
+        return self.dashboard.register_by_period.get(self.pk, [])
 
     def get_subject_average(
         self, subject: Union[SubjectType, str]
@@ -315,7 +328,7 @@ class Period(CommonObject):
         return self.subject_averages.get(key)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Grade(CommonObject):
     created_at: Date
     """When the grade was added to the system"""
@@ -353,7 +366,7 @@ class Grade(CommonObject):
         return f"{self.subject.shortcut}: {self.label}"
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Reminder(CommonObject):
     date: Date
     start_time: time
@@ -375,7 +388,7 @@ class Reminder(CommonObject):
         return self.end_time
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Justification:
     date: Date
     comment: str
@@ -384,7 +397,7 @@ class Justification:
         return self.comment
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class AbsenceEvent(CommonObject):
     date: Date
     type: AbsenceType
@@ -404,7 +417,7 @@ class AbsenceEvent(CommonObject):
         )
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class OutOfClass(CommonObject):
     date: Date
     note: str
@@ -413,7 +426,7 @@ class OutOfClass(CommonObject):
     online: bool
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class HomeworkAssigned:
     text: str
     date: Date
@@ -433,7 +446,7 @@ class HomeworkAssigned:
         return self.text
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class DayEvent(CommonObject):
     date: Date
     teacher: Teacher
@@ -455,7 +468,7 @@ class DayEvent(CommonObject):
         )
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Day:
     date: Date
     period: Period
@@ -475,7 +488,7 @@ class Day:
         )
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class SharedFile(CommonObject):
     file: Any  # just give this directly for now
     date: Date
@@ -485,5 +498,97 @@ class SharedFile(CommonObject):
     attachments: list  # to implement
     url: str
 
+    @property
+    def filename(self) -> str:
+        if isinstance(self.file, dict) and self.file.get("nomeFile"):
+            return self.file["nomeFile"]
+
+        return posixpath.basename(urlsplit(self.url).path) or self.pk
+
+    async def get_download_url(self, refresh: bool = False) -> str:
+        # shared files come with their URL, there's nothing to resolve
+        if not self.url:
+            raise ValueError("This shared file has no URL to download it from.")
+
+        return self.url
+
+
+@dataclass(frozen=True, slots=True)
+class DownloadProgress:
+    item: Any
+    path: str
+    downloaded: int
+    total: Optional[int]
+    resumed_from: int
+    elapsed: float
+
+    @property
+    def speed(self) -> float:
+        """Bytes per second downloaded in this session, excluding resumed data."""
+        if self.elapsed <= 0:
+            return 0.0
+
+        return (self.downloaded - self.resumed_from) / self.elapsed
+
+
+@dataclass(frozen=True, slots=True)
+class DownloadResult:
+    item: Any
+    path: str
+    size: int
+    resumed_from: int
+    elapsed: float
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def speed(self) -> float:
+        if self.elapsed <= 0:
+            return 0.0
+
+        return (self.size - self.resumed_from) / self.elapsed
+
+
+@dataclass(frozen=True, slots=True)
+class GradeAdded:
+    grade: Grade
+
+
+@dataclass(frozen=True, slots=True)
+class GradeChanged:
+    old: Grade
+    new: Grade
+
+
+@dataclass(frozen=True, slots=True)
+class InboxItemAdded:
+    item: "InboxItem"
+
+
+@dataclass(frozen=True, slots=True)
+class AbsenceAdded:
+    absence: AbsenceEvent
+
+
+@dataclass(frozen=True, slots=True)
+class HomeworkAdded:
+    homework: HomeworkAssigned
+
+
+@dataclass(frozen=True, slots=True)
+class ReminderAdded:
+    reminder: Reminder
+
 
 SubjectType = Union[Subject, PartialSubject]
+ChangeEvent = Union[
+    GradeAdded,
+    GradeChanged,
+    InboxItemAdded,
+    AbsenceAdded,
+    HomeworkAdded,
+    ReminderAdded,
+]
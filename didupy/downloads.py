@@ -0,0 +1,265 @@
+import os
+import re
+import time
+import random
+import asyncio
+from typing import Optional, Callable, Iterable, Protocol
+
+import aiohttp
+from aiohttp import ClientTimeout
+
+from .client import DidUPClient
+from .dataclasses import DownloadProgress, DownloadResult
+from .errors import DidUPyError
+from .utils import DEFAULT_CHUNK_SIZE, gather, write_chunks
+
+ProgressCallback = Callable[[DownloadProgress], None]
+
+_CONTENT_RANGE = re.compile(r"bytes\s+(?:\d+-\d+|\*)/(\d+)")
+
+
+class Downloadable(Protocol):
+    """Anything with a resolvable download URL, like ItemAttachment or SharedFile."""
+
+    @property
+    def pk(self) -> str: ...
+
+    @property
+    def filename(self) -> str: ...
+
+    async def get_download_url(self, refresh: bool = False) -> str: ...
+
+
+def default_filename(item: Downloadable) -> str:
+    # many circulars share the same file name, the pk keeps them apart
+    name = os.path.basename(item.filename.replace("\\", "/"))
+    return f"{item.pk}_{name}" if name else item.pk
+
+
+def _size_of(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class _URLExpired(Exception):
+    pass
+
+
+class _Transfer:
+    def __init__(self, item: Downloadable, path: str, resumed_from: int):
+        self.item = item
+        self.path = path
+        self.part = f"{path}.part"
+        self.resumed_from = resumed_from
+        self.downloaded = resumed_from
+        self.total: Optional[int] = None
+        self.start = time.monotonic()
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.start
+
+    def progress(self) -> DownloadProgress:
+        return DownloadProgress(
+            item=self.item,
+            path=self.path,
+            downloaded=self.downloaded,
+            total=self.total,
+            resumed_from=self.resumed_from,
+            elapsed=self.elapsed,
+        )
+
+    def result(self, error: Optional[Exception] = None) -> DownloadResult:
+        return DownloadResult(
+            item=self.item,
+            path=self.path,
+            size=self.downloaded,
+            resumed_from=self.resumed_from,
+            elapsed=self.elapsed,
+            error=error,
+        )
+
+
+class AttachmentDownloader:
+    """
+    Download many attachments at once, with bounded concurrency.
+
+    Files are written to "<path>.part" first and renamed once complete. A
+    leftover .part file (from a failed or interrupted run) is resumed with
+    a Range request. Expired download URLs (403) are resolved again, and
+    network errors are retried with exponential backoff.
+
+    downloader = AttachmentDownloader(client, on_progress=print)
+    results = await downloader.download_many(
+        [a for item in client.me.dashboard.inbox for a in item.attachments],
+        "circolari",
+    )
+    """
+
+    def __init__(
+        self,
+        client: DidUPClient,
+        *,
+        max_concurrency: int = 4,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        retries: int = 3,
+        timeout: ClientTimeout = ClientTimeout(
+            total=None, sock_connect=30, sock_read=60
+        ),
+        on_progress: Optional[ProgressCallback] = None,
+        filename: Callable[[Downloadable], str] = default_filename,
+    ):
+        if max_concurrency <= 0:
+            raise ValueError("max_concurrency must be positive")
+
+        self.client = client
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.timeout = timeout
+        self.on_progress = on_progress
+        self.filename = filename
+        self.__limiter = asyncio.Semaphore(max_concurrency)
+
+    def _report(self, transfer: _Transfer):
+        if self.on_progress is not None:
+            self.on_progress(transfer.progress())
+
+    async def download(
+        self, item: Downloadable, path: str, overwrite: bool = False
+    ) -> DownloadResult:
+        """
+        Download a single item to the given path. Errors are not raised,
+        but returned in the result.
+        """
+        async with self.__limiter:
+            if not overwrite and await asyncio.to_thread(os.path.isfile, path):
+                # already there, resumed_from == size means nothing was moved
+                size = await asyncio.to_thread(_size_of, path)
+                return DownloadResult(item, path, size, size, 0.0)
+
+            transfer = _Transfer(
+                item, path, await asyncio.to_thread(_size_of, f"{path}.part")
+            )
+            try:
+                await self.__download(transfer)
+            except Exception as e:  # pylint: disable=broad-except
+                return transfer.result(e)
+
+            return transfer.result()
+
+    async def download_many(
+        self,
+        items: Iterable[Downloadable],
+        directory: str,
+        overwrite: bool = False,
+    ) -> list[DownloadResult]:
+        """
+        Download every item to the directory, in parallel. The results are in
+        the same order as the items.
+        """
+        await asyncio.to_thread(os.makedirs, directory, exist_ok=True)
+
+        items = list(items)
+        paths = [os.path.join(directory, self.filename(item)) for item in items]
+
+        # the same item listed twice must not be written by two tasks
+        unique = dict(zip(paths, items))
+        results = await gather(
+            *(self.download(item, path, overwrite) for path, item in unique.items())
+        )
+        by_path = dict(zip(unique, results))
+        return [by_path[path] for path in paths]
+
+    async def __download(self, transfer: _Transfer):
+        url = await transfer.item.get_download_url()
+        attempt = 0
+        while True:
+            try:
+                await self.__fetch(transfer, url)
+                return
+            except _URLExpired:
+                if attempt >= self.retries:
+                    raise DidUPyError(
+                        f"The download URL of {transfer.item.pk} keeps being refused."
+                    ) from None
+
+                # signed URLs expire, get a fresh one
+                url = await transfer.item.get_download_url(refresh=True)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt >= self.retries:
+                    raise
+                if (
+                    isinstance(e, aiohttp.ClientResponseError)
+                    and e.status < 500
+                    and e.status != 429
+                ):
+                    raise
+
+                await asyncio.sleep(min(2**attempt, 30) * random.uniform(0.5, 1.0))
+
+            attempt += 1
+
+    async def __fetch(self, transfer: _Transfer, url: str):
+        offset = await asyncio.to_thread(_size_of, transfer.part)
+        headers = {"Range": f"bytes={offset}-"} if offset else None
+
+        async with self.client.session.get(
+            url, headers=headers, timeout=self.timeout
+        ) as response:
+            if response.status == 403:
+                raise _URLExpired()
+
+            if offset and response.status == 416:
+                match = _CONTENT_RANGE.match(response.headers.get("Content-Range", ""))
+                if match and int(match.group(1)) == offset:
+                    # we already had all of it
+                    transfer.downloaded = transfer.total = offset
+                    await asyncio.to_thread(os.replace, transfer.part, transfer.path)
+                    self._report(transfer)
+                    return
+
+                # the file changed under us, start over
+                await asyncio.to_thread(_remove, transfer.part)
+                raise aiohttp.ClientPayloadError("Partial download is stale")
+
+            response.raise_for_status()
+
+            if response.status == 206:
+                match = _CONTENT_RANGE.match(response.headers.get("Content-Range", ""))
+                if match:
+                    transfer.total = int(match.group(1))
+                elif response.content_length is not None:
+                    transfer.total = offset + response.content_length
+            else:
+                # the server ignored the range and sent the whole file
+                offset = 0
+                transfer.resumed_from = 0
+                transfer.total = response.content_length
+
+            transfer.downloaded = offset
+            self._report(transfer)
+
+            async def chunks():
+                async for chunk in response.content.iter_chunked(self.chunk_size):
+                    yield chunk
+                    # the chunk has been written by now
+                    transfer.downloaded += len(chunk)
+                    self._report(transfer)
+
+            await write_chunks(chunks(), transfer.part, append=offset > 0)
+
+        if transfer.total is not None and transfer.downloaded != transfer.total:
+            raise aiohttp.ClientPayloadError(
+                f"Got {transfer.downloaded} bytes out of {transfer.total}"
+            )
+
+        await asyncio.to_thread(os.replace, transfer.part, transfer.path)
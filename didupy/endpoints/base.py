@@ -1,5 +1,9 @@
+import inspect
+import functools
 from datetime import datetime, date
+from typing import Any, Optional, Callable, TypeVar
 from pytz import timezone
+from ..utils import DidUPyResponse
 from .types import (
     ProfiloResponse,
     DashboardResponse,
@@ -10,24 +14,95 @@ from .types import (
     PresaVisioneAdesioneResponse,
 )
 
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+def cached(func: F) -> F:
+    """Serve the response from the client's EndpointCache, if any."""
+
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    async def wrapper(self: "Endpoints", *args, **kwargs):
+        cache = self.client.cache
+        if cache is None or not cache.caches(func.__name__):
+            return await func(self, *args, **kwargs)
+
+        # the same call with positional or keyword arguments shares the key
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        arguments = tuple(bound.arguments.items())[1:]
+
+        key = (self.client.account_key, self._profile_index, func.__name__, arguments)
+        hit, value = cache.get(key)
+        if hit:
+            return value
+
+        value = await func(self, *args, **kwargs)
+        cache.set(key, value)
+        return value
+
+    return wrapper  # type: ignore
+
 
 class Endpoints:
-    def __init__(self, client):
+    def __init__(self, client, profile=None):
         from ..client import DidUPClient
+        from ..me import Me
 
         self.client: DidUPClient = client
+        # if set, requests are made on behalf of this profile
+        self.profile: Me | None = profile
+
+    async def _request(
+        self, method: str, endpoint: str, **kwargs: Any
+    ) -> DidUPyResponse:
+        if self.profile is not None:
+            kwargs["auth_token"] = self.profile.token
+
+        return await self.client.request(method, endpoint, **kwargs)
+
+    @property
+    def _profile_index(self) -> int:
+        if self.profile is None:
+            return 0
+
+        return self.client.profiles.index(self.profile)
+
+    def invalidate(self, endpoint: Optional[str] = None) -> int:
+        """
+        Drop the cached responses of this profile, optionally only the ones
+        of the given endpoint (e.g. "profilo").
+        """
+        if self.client.cache is None:
+            return 0
+
+        return self.client.cache.invalidate(
+            account=self.client.account_key,
+            endpoint=endpoint,
+            profile=self._profile_index,
+        )
 
+    @cached
     async def profilo(self) -> ProfiloResponse:
-        content, _ = await self.client.request("GET", "profilo")
+        content, _ = await self._request("GET", "profilo")
         return content  #  type: ignore
 
-    async def dashboard(self) -> DashboardResponse:
-        now = datetime(1970, 1, 1, 0, 0, 0, tzinfo=timezone("Europe/Rome"))
-        content, _ = await self.client.request(
+    async def dashboard(self, since: Optional[datetime] = None) -> DashboardResponse:
+        """
+        Get the dashboard. If since is given, only what changed after it is
+        returned (the entries have 'operazione' set to 'D' when deleted).
+        """
+        if since is None:
+            since = datetime(1970, 1, 1, 0, 0, 0, tzinfo=timezone("Europe/Rome"))
+        else:
+            since = since.astimezone(timezone("Europe/Rome"))
+
+        content, _ = await self._request(
             "POST",
             "dashboard/dashboard",
             json={
-                "dataultimoaggiornamento": now.strftime("%Y-%m-%d %H:%M:%S.%f"),
+                "dataultimoaggiornamento": since.strftime("%Y-%m-%d %H:%M:%S.%f"),
             },
         )
         return content  #  type: ignore
@@ -36,7 +111,7 @@ class Endpoints:
         self, pk: str, presa_visione: bool
     ) -> PresaVisioneAdesioneResponse:
         # TODO: find out what the response of this endpoint is
-        content, _ = await self.client.request(
+        content, _ = await self._request(
             "POST",
             "presavisioneadesione",
             json={
@@ -47,19 +122,21 @@ class Endpoints:
         return content  #  type: ignore
 
     async def download_allegato_bacheca(self, pk: str) -> DownloadBachecaResponse:
-        content, _ = await self.client.request(
+        content, _ = await self._request(
             "POST", "downloadallegatobacheca", json={"uid": pk}
         )
 
         return content  #  type: ignore
 
+    @cached
     async def voti_scrutinio(self) -> dict:
         # to be typed
-        content, _ = await self.client.request("POST", "votiscrutinio", json={})
+        content, _ = await self._request("POST", "votiscrutinio", json={})
         return content  # type: ignore
 
+    @cached
     async def orario_giorno(self, date_: date) -> OrarioGiornoResponse:
-        content, _ = await self.client.request(
+        content, _ = await self._request(
             "POST", "orario-giorno", json={"datGiorno": date_.strftime("%Y-%m-%d")}
         )
 
@@ -67,36 +144,38 @@ class Endpoints:
 
     async def colloqui(self) -> dict:
         # to be typed
-        content, _ = await self.client.request("POST", "ricevimento", json={})
+        content, _ = await self._request("POST", "ricevimento", json={})
         return content  # type: ignore
 
     async def pagamenti(self, pk_scheda: str) -> dict:
         # to be typed
-        content, _ = await self.client.request(
+        content, _ = await self._request(
             "POST", "pagamenti", json={"pkScheda": pk_scheda}
         )
         return content  # type: ignore
 
+    @cached
     async def curriculum(self) -> CurriculumResponse:
 
         # to be typed
-        content, _ = await self.client.request("POST", "curriculumalunno", json={})
+        content, _ = await self._request("POST", "curriculumalunno", json={})
         return content  # type: ignore
 
     async def storico_bacheca(self, pk_scheda: str) -> dict:
         # TODO: find out what the response of this endpoint is
-        content, _ = await self.client.request(
+        content, _ = await self._request(
             "POST", "storicobacheca", json={"pkScheda": pk_scheda}
         )
         return content  # type: ignore
 
     async def storico_bacheca_alunno(self, pk_scheda: str) -> dict:
         # TODO: find out what the response of this endpoint is
-        content, _ = await self.client.request(
+        content, _ = await self._request(
             "POST", "storicobachecaalunno", json={"pkScheda": pk_scheda}
         )
         return content  # type: ignore
 
+    @cached
     async def dettaglio_profilo(self) -> DettaglioProfiloResponse:
-        content, _ = await self.client.request("POST", "dettaglioprofilo", json={})
+        content, _ = await self._request("POST", "dettaglioprofilo", json={})
         return content  # type: ignore
@@ -1,7 +1,15 @@
-from typing import Dict
-from datetime import date
+from typing import Dict, Optional
+from datetime import date, datetime
+from pytz import timezone
 from .dashboard import Dashboard
+from .endpoints import Endpoints
+from .utils import gather
 from .dataclasses import SchoolData, UserData, UserResidenceData, ProfileOptions
+from .endpoints.types import (
+    ProfiloResponse,
+    DettaglioProfiloResponse,
+    DashboardResponse,
+)
 
 
 class Me:
@@ -14,30 +22,65 @@ class Me:
         self.__user = None
         self.__school = None
         self.__user_pk = None
-        self.__dashboard = None
+        self.__endpoints = Endpoints(client, self)
+        self.__dashboard = Dashboard(client, self)
 
-    async def _fill_data(self, mobile_login: dict):
-        try:
-            data = list(
-                filter(
-                    lambda x: x.get("username", None) == self.client.username,
-                    mobile_login.get("data", []),
-                )
-            ).pop(0)
-        except IndexError:
-            raise ValueError("No valid profile found.") from None
+    @property
+    def endpoints(self) -> Endpoints:
+        """Endpoints making requests on behalf of this profile."""
+        return self.__endpoints
 
+    def _set_credentials(self, data: dict):
+        """Set the credentials from this profile's entry of the mobile login."""
         self.__mobile_token = data["token"]
         self.__options = {a["chiave"]: a["valore"] for a in data.get("opzioni", [])}
 
-        await self.fetch()
+    async def reload(self):
+        """
+        Fetch the profile and the dashboard again.
+
+        With lazy_dashboard, the dashboard is only fetched if it was loaded before.
+        """
+        if self.client.lazy_dashboard and not self.__dashboard.loaded:
+            await self.fetch()
+            return
+
+        self._invalidate_profile()
+        # none of these depend on each other
+        fetched_at = datetime.now(timezone("Europe/Rome"))
+        profile, profile_detail, dashboard = await gather(
+            self.endpoints.profilo(),
+            self.endpoints.dettaglio_profilo(),
+            self.endpoints.dashboard(),
+        )
+        self._load_profile(profile, profile_detail)
+        self._load_dashboard(dashboard, fetched_at)
+
+    def _load_dashboard(
+        self, payload: DashboardResponse, fetched_at: Optional[datetime] = None
+    ):
+        self.__dashboard._load(payload, fetched_at)  # pylint: disable=protected-access
+
+    async def load_dashboard(self) -> Dashboard:
+        """Fetch the dashboard if it was not loaded yet."""
+        return await self.dashboard
 
-        self.__dashboard = Dashboard(self.client)
-        await self.__dashboard.fetch()
+    def _invalidate_profile(self):
+        # asking for the profile again means not wanting the cached one
+        for endpoint in ("profilo", "dettaglio_profilo"):
+            self.endpoints.invalidate(endpoint)
 
     async def fetch(self):
-        profile = await self.client.endpoints.profilo()
-        profile_detail = await self.client.endpoints.dettaglio_profilo()
+        self._invalidate_profile()
+        profile, profile_detail = await gather(
+            self.endpoints.profilo(),
+            self.endpoints.dettaglio_profilo(),
+        )
+        return self._load_profile(profile, profile_detail)
+
+    def _load_profile(
+        self, profile: ProfiloResponse, profile_detail: DettaglioProfiloResponse
+    ):
         data = profile["data"]
         scheda = data["scheda"]
         self.__user_pk = scheda["pk"]
@@ -84,9 +127,20 @@ class Me:
 
         return self
 
+    @property
+    def _dashboard(self) -> Dashboard:
+        """The dashboard, even if it was not loaded yet."""
+        return self.__dashboard
+
     @property
     def dashboard(self) -> Dashboard:
-        if self.__dashboard is None:
+        """
+        The dashboard of this profile.
+
+        With lazy_dashboard, it is only fetched once awaited
+        ('await client.me.dashboard') or through 'load_dashboard()'.
+        """
+        if not self.client.lazy_dashboard and not self.__dashboard.loaded:
             raise ValueError("Dashboard not initialized. Log in first.")
 
         return self.__dashboard
@@ -0,0 +1,150 @@
+import asyncio
+from typing import (
+    Optional,
+    Callable,
+    Awaitable,
+    AsyncIterator,
+    Iterable,
+    TypeVar,
+    Any,
+)
+
+import aiohttp
+
+from .client import DidUPClient
+from .dataclasses import PoolResult
+from .utils import create_connector
+
+T = TypeVar("T")
+
+
+class ClientPool:
+    """
+    Manage many DidUPClient instances sharing one connection pool.
+
+    Logins and API requests are capped globally across all the clients.
+    Must be used from a running event loop.
+
+    async with ClientPool(max_logins=4, max_requests=32) as pool:
+        for school_code, username, password in accounts:
+            pool.add(school_code, username, password)
+
+        async for res in pool.run(sync):
+            ...
+    """
+
+    def __init__(
+        self,
+        *,
+        max_logins: int = 4,
+        max_requests: int = 32,
+        connector: Optional[aiohttp.BaseConnector] = None,
+        **client_kwargs: Any,
+    ):
+        self.__login_limiter = asyncio.Semaphore(max_logins)
+        self.__request_limiter = asyncio.Semaphore(max_requests)
+        self.__connector = connector
+        self.__owns_connector = connector is None
+        self.__client_kwargs = client_kwargs
+        self.__clients: dict[str, DidUPClient] = {}
+
+    @property
+    def connector(self) -> aiohttp.BaseConnector:
+        if self.__connector is None:
+            self.__connector = create_connector()
+
+        return self.__connector
+
+    @property
+    def clients(self) -> list[DidUPClient]:
+        return list(self.__clients.values())
+
+    def add(
+        self, school_code: str, username: str, password: str, **kwargs: Any
+    ) -> DidUPClient:
+        """Add an account to the pool, returning its client."""
+        kwargs = {**self.__client_kwargs, **kwargs}
+        client = DidUPClient(
+            school_code,
+            username,
+            password,
+            connector=self.connector,
+            login_limiter=self.__login_limiter,
+            request_limiter=self.__request_limiter,
+            **kwargs,
+        )
+        if client.account_key in self.__clients:
+            raise ValueError(f"Account {client.account_key!r} already in the pool")
+
+        self.__clients[client.account_key] = client
+        return client
+
+    def get(self, school_code: str, username: str) -> Optional[DidUPClient]:
+        return self.__clients.get(f"{school_code}:{username}")
+
+    async def remove(self, client: DidUPClient):
+        """Remove a client from the pool and close it."""
+        if self.__clients.pop(client.account_key, None) is not None:
+            await client.close()
+
+    async def run(
+        self,
+        sync: Callable[[DidUPClient], Awaitable[T]],
+        clients: Optional[Iterable[DidUPClient]] = None,
+    ) -> AsyncIterator[PoolResult[T]]:
+        """
+        Run sync on every client (or on the given ones), logging them in first
+        if needed, and yield the results as they complete.
+
+        Failures are yielded as results with their error set.
+        """
+
+        async def _run(client: DidUPClient) -> PoolResult[T]:
+            try:
+                await client._ensure_login()  # pylint: disable=protected-access
+                return PoolResult(client=client, result=await sync(client), error=None)
+            except Exception as e:  # pylint: disable=broad-except
+                return PoolResult(client=client, result=None, error=e)
+
+        tasks = [
+            asyncio.create_task(_run(c))
+            for c in (self.clients if clients is None else clients)
+        ]
+        try:
+            for fut in asyncio.as_completed(tasks):
+                yield await fut
+        finally:
+            # the caller might stop iterating early
+            for task in tasks:
+                task.cancel()
+
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def login(self) -> AsyncIterator[PoolResult[bool]]:
+        """Log in every client that is not logged in, yielding the outcomes."""
+
+        async def _noop(_: DidUPClient) -> bool:
+            return True
+
+        async for res in self.run(_noop):
+            yield res
+
+    async def close(self):
+        await asyncio.gather(
+            *(client.close() for client in self.__clients.values()),
+            return_exceptions=True,
+        )
+        self.__clients.clear()
+
+        if self.__owns_connector and self.__connector is not None:
+            await self.__connector.close()
+            self.__connector = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def __len__(self) -> int:
+        return len(self.__clients)
@@ -0,0 +1,177 @@
+import time
+import asyncio
+from collections import OrderedDict
+from datetime import datetime, timezone
+from urllib.parse import urlsplit, parse_qsl
+from typing import Optional, Iterable, Tuple, TYPE_CHECKING
+
+from .utils import gather
+
+if TYPE_CHECKING:
+    from .endpoints import Endpoints
+    from .downloads import Downloadable
+
+ResolverKey = Tuple[str, str]
+"""(account, attachment pk)"""
+
+
+def _parse_amz_date(value: str) -> float:
+    return (
+        datetime.strptime(value, "%Y%m%dT%H%M%SZ")
+        .replace(tzinfo=timezone.utc)
+        .timestamp()
+    )
+
+
+def url_expiry(url: str) -> Optional[float]:
+    """
+    Guess when a signed URL expires (as a UNIX timestamp) from the usual
+    query parameters of S3, Google Cloud Storage, CloudFront and Azure.
+    """
+    query = {k.lower(): v for k, v in parse_qsl(urlsplit(url).query)}
+    try:
+        for prefix in ("x-amz-", "x-goog-"):
+            if f"{prefix}date" in query and f"{prefix}expires" in query:
+                return _parse_amz_date(query[f"{prefix}date"]) + int(
+                    query[f"{prefix}expires"]
+                )
+
+        if "expires" in query:
+            return float(query["expires"])
+
+        if "se" in query:
+            return datetime.fromisoformat(
+                query["se"].replace("Z", "+00:00")
+            ).timestamp()
+    except ValueError:
+        pass
+
+    return None
+
+
+class DownloadURLResolver:
+    """
+    Resolve the download URLs of inbox attachments.
+
+    URLs are cached until shortly (margin seconds) before they expire, as
+    read from their signature, or for ttl seconds when they don't say.
+    Concurrent lookups of the same attachment share a single request, and
+    at most max_concurrency requests are made at once.
+
+    A single resolver can be shared between many clients, as keys include
+    the account.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_concurrency: int = 8,
+        ttl: float = 120.0,
+        margin: float = 30.0,
+        maxsize: int = 4096,
+    ):
+        if max_concurrency <= 0:
+            raise ValueError("max_concurrency must be positive")
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+
+        self.ttl = ttl
+        self.margin = margin
+        self.maxsize = maxsize
+        self.__limiter = asyncio.Semaphore(max_concurrency)
+        self.__urls: OrderedDict[ResolverKey, Tuple[float, str]] = OrderedDict()
+        self.__pending: dict[ResolverKey, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self.__urls)
+
+    def _lifetime(self, url: str) -> float:
+        expiry = url_expiry(url)
+        if expiry is None:
+            return self.ttl
+
+        return expiry - time.time() - self.margin
+
+    def _get(self, key: ResolverKey) -> Optional[str]:
+        entry = self.__urls.get(key)
+        if entry is None:
+            return None
+
+        expires_at, url = entry
+        if time.monotonic() >= expires_at:
+            del self.__urls[key]
+            return None
+
+        self.__urls.move_to_end(key)
+        return url
+
+    def _set(self, key: ResolverKey, url: str):
+        lifetime = self._lifetime(url)
+        if lifetime <= 0:
+            return
+
+        self.__urls[key] = (time.monotonic() + lifetime, url)
+        self.__urls.move_to_end(key)
+        while len(self.__urls) > self.maxsize:
+            self.__urls.popitem(last=False)
+
+    async def __fetch(self, key: ResolverKey, endpoints: "Endpoints") -> str:
+        try:
+            async with self.__limiter:
+                resp = await endpoints.download_allegato_bacheca(key[1])
+
+            url: str = resp["url"]  # type: ignore
+            self._set(key, url)
+            return url
+        finally:
+            self.__pending.pop(key, None)
+
+    async def resolve(
+        self, endpoints: "Endpoints", pk: str, refresh: bool = False
+    ) -> str:
+        """
+        Return the download URL of the attachment with the given pk. If refresh
+        is set, the cached URL (e.g. one that was just refused) is not used.
+        """
+        key = (endpoints.client.account_key, pk)
+        if refresh:
+            self.__urls.pop(key, None)
+        else:
+            url = self._get(key)
+            if url is not None:
+                return url
+
+        task = self.__pending.get(key)
+        if task is None:
+            task = asyncio.create_task(self.__fetch(key, endpoints))
+            self.__pending[key] = task
+
+        # a cancelled caller must not cancel the lookup for everyone else
+        return await asyncio.shield(task)
+
+    async def resolve_many(self, items: Iterable["Downloadable"]) -> list[str]:
+        """
+        Resolve the download URLs of many attachments (or shared files) at
+        once, returning them in the same order.
+        """
+        return await gather(*(item.get_download_url() for item in items))
+
+    def invalidate(
+        self, account: Optional[str] = None, pk: Optional[str] = None
+    ) -> int:
+        """
+        Drop the cached URLs matching all the given filters (everything if none
+        is given). Returns how many were dropped.
+        """
+        keys = [
+            key
+            for key in self.__urls
+            if (account is None or key[0] == account) and (pk is None or key[1] == pk)
+        ]
+        for key in keys:
+            del self.__urls[key]
+
+        return len(keys)
+
+    def clear(self):
+        self.__urls.clear()
@@ -0,0 +1,155 @@
+import random
+import asyncio
+import logging
+from typing import Optional, Callable, Awaitable, Iterable
+
+from .client import DidUPClient
+from .dataclasses import ChangeEvent
+
+_log = logging.getLogger(__name__)
+
+ChangeCallback = Callable[[DidUPClient, list[ChangeEvent]], Awaitable[None]]
+
+
+class PollingScheduler:
+    """
+    Periodically refresh the dashboards of one or many clients.
+
+    Every account has its own interval, which shrinks (down to min_interval)
+    after a refresh with changes and grows (up to max_interval) after one
+    without. Failed refreshes are retried with exponential backoff.
+
+    async with PollingScheduler(on_change=notify) as scheduler:
+        scheduler.add(client)
+        ...
+    """
+
+    def __init__(
+        self,
+        *,
+        interval: float = 300.0,
+        min_interval: float = 60.0,
+        max_interval: float = 3600.0,
+        speedup: float = 0.5,
+        slowdown: float = 1.5,
+        jitter: float = 0.1,
+        max_backoff: float = 3600.0,
+        incremental: bool = True,
+        on_change: Optional[ChangeCallback] = None,
+    ):
+        if not min_interval <= interval <= max_interval:
+            raise ValueError("interval must be between min_interval and max_interval")
+
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.speedup = speedup
+        self.slowdown = slowdown
+        self.jitter = jitter
+        self.max_backoff = max_backoff
+        self.incremental = incremental
+        self.on_change = on_change
+        self.__clients: dict[str, DidUPClient] = {}
+        self.__intervals: dict[str, float] = {}
+        self.__tasks: dict[str, asyncio.Task] = {}
+        self.__running = False
+
+    @property
+    def running(self) -> bool:
+        return self.__running
+
+    def interval_of(self, client: DidUPClient) -> Optional[float]:
+        """The current polling interval of a client, in seconds."""
+        return self.__intervals.get(client.account_key)
+
+    def add(self, client: DidUPClient, interval: Optional[float] = None):
+        key = client.account_key
+        self.__clients[key] = client
+        self.__intervals[key] = min(
+            max(interval or self.interval, self.min_interval), self.max_interval
+        )
+        if self.__running and key not in self.__tasks:
+            self.__tasks[key] = asyncio.create_task(self.__poll(client))
+
+    def add_many(self, clients: Iterable[DidUPClient]):
+        for client in clients:
+            self.add(client)
+
+    async def remove(self, client: DidUPClient):
+        key = client.account_key
+        self.__clients.pop(key, None)
+        self.__intervals.pop(key, None)
+        task = self.__tasks.pop(key, None)
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    def _sleep_time(self, delay: float) -> float:
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    async def refresh(self, client: DidUPClient) -> list[ChangeEvent]:
+        """
+        Refresh the dashboards of every profile of a client once. Lazy
+        dashboards are loaded on the first poll.
+        """
+        await client._ensure_login()  # pylint: disable=protected-access
+        await client.refresh_dashboards(incremental=self.incremental)
+
+        # pylint: disable-next=protected-access
+        return [e for profile in client.profiles for e in profile._dashboard.changes]
+
+    async def __poll(self, client: DidUPClient):
+        key = client.account_key
+        failures = 0
+        while True:
+            if failures:
+                delay = min(self.__intervals[key] * 2**failures, self.max_backoff)
+            else:
+                delay = self.__intervals[key]
+
+            await asyncio.sleep(self._sleep_time(delay))
+            try:
+                changes = await self.refresh(client)
+            except Exception:  # pylint: disable=broad-except
+                failures += 1
+                _log.warning("Refresh failed for %s", key, exc_info=True)
+                continue
+
+            failures = 0
+            if changes:
+                self.__intervals[key] = max(
+                    self.__intervals[key] * self.speedup, self.min_interval
+                )
+                if self.on_change is not None:
+                    try:
+                        await self.on_change(client, changes)
+                    except Exception:  # pylint: disable=broad-except
+                        _log.exception("on_change callback failed for %s", key)
+            else:
+                self.__intervals[key] = min(
+                    self.__intervals[key] * self.slowdown, self.max_interval
+                )
+
+    def start(self):
+        if self.__running:
+            return
+
+        self.__running = True
+        for key, client in self.__clients.items():
+            self.__tasks[key] = asyncio.create_task(self.__poll(client))
+
+    async def stop(self):
+        self.__running = False
+        tasks = list(self.__tasks.values())
+        self.__tasks.clear()
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
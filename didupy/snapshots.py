@@ -0,0 +1,83 @@
+import os
+import json
+import asyncio
+import hashlib
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Optional
+
+from .dataclasses import DashboardSnapshot
+
+
+class SnapshotStore(ABC):
+    """
+    Persistent storage for the last good dashboard data of each profile,
+    served while a fresh copy is being downloaded.
+    """
+
+    @abstractmethod
+    async def load(self, key: str) -> Optional[DashboardSnapshot]:
+        """Return the stored snapshot for the given key, if any."""
+
+    @abstractmethod
+    async def save(self, key: str, snapshot: DashboardSnapshot):
+        """Store the snapshot for the given key."""
+
+    @abstractmethod
+    async def delete(self, key: str):
+        """Remove the stored snapshot for the given key."""
+
+
+class FileSnapshotStore(SnapshotStore):
+    """Store snapshots as JSON files in a directory, one file per profile."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{name}.json")
+
+    def _read(self, key: str) -> Optional[DashboardSnapshot]:
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                raw = json.load(f)
+
+            return DashboardSnapshot(
+                data=raw["data"],
+                fetched_at=datetime.fromisoformat(raw["fetched_at"]),
+            )
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError):
+            # corrupted, we'll just wait for the server
+            return None
+
+    def _write(self, key: str, snapshot: DashboardSnapshot):
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "data": snapshot.data,
+                    "fetched_at": snapshot.fetched_at.isoformat(),
+                },
+                f,
+            )
+        os.replace(tmp, path)
+
+    def _remove(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    async def load(self, key: str) -> Optional[DashboardSnapshot]:
+        return await asyncio.to_thread(self._read, key)
+
+    async def save(self, key: str, snapshot: DashboardSnapshot):
+        await asyncio.to_thread(self._write, key, snapshot)
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self._remove, key)
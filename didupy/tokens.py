@@ -0,0 +1,209 @@
+import os
+import json
+import asyncio
+import hashlib
+import sqlite3
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager, closing
+from datetime import datetime
+from typing import Optional, AsyncIterator
+
+from .dataclasses import TokenData
+
+try:
+    import fcntl
+except ImportError:  # windows
+    fcntl = None
+    import msvcrt
+
+
+def _dump(data: TokenData) -> str:
+    return json.dumps(
+        {
+            "token": data.token,
+            "refresh_token": data.refresh_token,
+            "expires_at": data.expires_at.isoformat(),
+            "mobile_login": data.mobile_login,
+        }
+    )
+
+
+def _load(raw: str) -> TokenData:
+    data = json.loads(raw)
+    return TokenData(
+        token=data["token"],
+        refresh_token=data.get("refresh_token"),
+        expires_at=datetime.fromisoformat(data["expires_at"]),
+        mobile_login=data["mobile_login"],
+    )
+
+
+class TokenStore(ABC):
+    """
+    Persistent storage for the credentials of a DidUPClient.
+
+    Keys identify an account (see DidUPClient.account_key).
+    """
+
+    def __init__(self):
+        self.__locks: dict[str, asyncio.Lock] = {}
+
+    @abstractmethod
+    async def load(self, key: str) -> Optional[TokenData]:
+        """Return the stored credentials for the given key, if any."""
+
+    @abstractmethod
+    async def save(self, key: str, data: TokenData):
+        """Store the credentials for the given key."""
+
+    @abstractmethod
+    async def delete(self, key: str):
+        """Remove the stored credentials for the given key."""
+
+    @asynccontextmanager
+    async def lock(self, key: str) -> AsyncIterator[None]:
+        """
+        Hold an exclusive lock on the given key while logging in.
+
+        The default implementation only locks within the current process.
+        """
+        lock = self.__locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            yield
+
+
+class FileTokenStore(TokenStore):
+    """
+    Store credentials as JSON files in a directory, one file per account.
+
+    Logins are locked across processes, so several workers sharing the same
+    directory only log in once per account.
+    """
+
+    def __init__(self, directory: str):
+        super().__init__()
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str, ext: str = "json") -> str:
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{name}.{ext}")
+
+    def _read(self, key: str) -> Optional[TokenData]:
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return _load(f.read())
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError):
+            # corrupted or from an older version, just log in again
+            return None
+
+    def _write(self, key: str, data: TokenData):
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(_dump(data))
+        os.replace(tmp, path)
+
+    def _remove(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    async def load(self, key: str) -> Optional[TokenData]:
+        return await asyncio.to_thread(self._read, key)
+
+    async def save(self, key: str, data: TokenData):
+        await asyncio.to_thread(self._write, key, data)
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self._remove, key)
+
+    @staticmethod
+    def _acquire(fd: int):
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+
+    @staticmethod
+    def _release(fd: int):
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+    @asynccontextmanager
+    async def lock(self, key: str) -> AsyncIterator[None]:
+        # the in-process lock keeps coroutines from piling up in threads
+        async with super().lock(key):
+            fd = os.open(self._path(key, "lock"), os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                await asyncio.to_thread(self._acquire, fd)
+                try:
+                    yield
+                finally:
+                    self._release(fd)
+            finally:
+                os.close(fd)
+
+
+class SQLiteTokenStore(TokenStore):
+    """
+    Store credentials in a SQLite database.
+
+    Logins are only locked within the current process.
+    """
+
+    def __init__(self, path: str, table: str = "didupy_tokens"):
+        super().__init__()
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name: {table!r}")
+
+        self.path = path
+        self.table = table
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} "
+                "(key TEXT PRIMARY KEY, data TEXT NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # a new connection every time, since we are called from worker threads
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _read(self, key: str) -> Optional[TokenData]:
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute(
+                f"SELECT data FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        try:
+            return _load(row[0])
+        except (ValueError, KeyError):
+            return None
+
+    def _write(self, key: str, data: TokenData):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, data) VALUES (?, ?)",
+                (key, _dump(data)),
+            )
+
+    def _remove(self, key: str):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    async def load(self, key: str) -> Optional[TokenData]:
+        return await asyncio.to_thread(self._read, key)
+
+    async def save(self, key: str, data: TokenData):
+        await asyncio.to_thread(self._write, key, data)
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self._remove, key)
@@ -1,11 +1,135 @@
+import io
 import os
+import re
+import json
 import base64
+import asyncio
 import hashlib
 
-from typing import Tuple, Union
-from aiohttp import ClientResponse
+from typing import (
+    Tuple,
+    Union,
+    Awaitable,
+    Any,
+    Optional,
+    Callable,
+    BinaryIO,
+    AsyncIterator,
+)
+from aiohttp import ClientResponse, ClientSession, TCPConnector
 
-DidUPyResponse = Tuple[Union[dict, str], ClientResponse]
+try:
+    import orjson
+except ImportError:  # optional, pip install didupy[speedups]
+    orjson = None
+
+DidUPyResponse = Tuple[Union[dict, str, bytes], ClientResponse]
+JSONLoads = Callable[[Union[str, bytes]], Any]
+
+default_json_loads: JSONLoads = orjson.loads if orjson is not None else json.loads
+"""orjson.loads if orjson is installed, json.loads otherwise"""
+
+_JSON_CONTENT_TYPE = re.compile(r"^application/(?:[\w.+-]+?\+)?json")
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+async def read_response(
+    response: ClientResponse, loads: JSONLoads = default_json_loads
+) -> Union[dict, str, None]:
+    """
+    Read the body of a response, decoding it with loads if it is JSON and
+    as text otherwise.
+    """
+    body = await response.read()
+    if not _JSON_CONTENT_TYPE.match(response.headers.get("Content-Type", "").lower()):
+        return body.decode(response.get_encoding())
+
+    body = body.strip()
+    if not body:
+        return None
+
+    # both json and orjson take bytes directly, no need to decode them first
+    return loads(body)
+
+
+async def write_chunks(
+    chunks: AsyncIterator[bytes], fp: Union[BinaryIO, str], append: bool = False
+) -> int:
+    """
+    Write the chunks to a file path or a binary file-like object as they
+    arrive, returning the number of bytes written. If append is set, a file
+    path is appended to instead of being truncated.
+
+    Only one chunk is held in memory at a time. Writes to real files happen
+    in a worker thread, so that slow disks don't block the event loop.
+    """
+    should_close = False
+    if isinstance(fp, str):
+        fp = await asyncio.to_thread(open, fp, "ab" if append else "wb")
+        should_close = True
+    elif not isinstance(fp, (io.RawIOBase, io.BufferedIOBase)):
+        raise TypeError("fp must be a file path or a binary file-like object")
+
+    # nothing to gain from a thread when writing to memory
+    in_memory = isinstance(fp, io.BytesIO)
+    written = 0
+    try:
+        async for chunk in chunks:
+            if in_memory:
+                fp.write(chunk)
+            else:
+                await asyncio.to_thread(fp.write, chunk)
+            written += len(chunk)
+    finally:
+        if should_close:
+            await asyncio.to_thread(fp.close)
+
+    return written
+
+
+async def read_chunks(
+    path: str, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> AsyncIterator[bytes]:
+    """Read a file in chunks of at most chunk_size bytes, in a worker thread."""
+    fp = await asyncio.to_thread(open, path, "rb")
+    try:
+        while chunk := await asyncio.to_thread(fp.read, chunk_size):
+            yield chunk
+    finally:
+        await asyncio.to_thread(fp.close)
+
+
+async def stream_url(
+    session: ClientSession, url: str, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> AsyncIterator[bytes]:
+    """Download a URL, yielding its body in chunks as they arrive."""
+    async with session.get(url) as response:
+        response.raise_for_status()
+
+        async for chunk in response.content.iter_chunked(chunk_size):
+            yield chunk
+
+
+def create_connector(
+    limit: int = 100,
+    limit_per_host: int = 20,
+    keepalive_timeout: float = 30.0,
+    ttl_dns_cache: Optional[int] = 300,
+) -> TCPConnector:
+    """
+    Create a connector to be shared between many clients.
+
+    The caller owns the connector and has to close it once all the clients
+    using it are closed. Must be called from a running event loop.
+    """
+    return TCPConnector(
+        limit=limit,
+        limit_per_host=limit_per_host,
+        keepalive_timeout=keepalive_timeout,
+        use_dns_cache=ttl_dns_cache is not None,
+        ttl_dns_cache=ttl_dns_cache,
+    )
 
 
 def generate_22byte_b64_string() -> str:
@@ -24,3 +148,19 @@ def get_pkce_pair() -> tuple[str, str]:
         .decode("utf-8")
     )
     return code_verifier, code_challenge
+
+
+async def gather(*aws: Awaitable[Any]) -> list[Any]:
+    """
+    Run the awaitables concurrently and return their results in order.
+
+    If any of them fails, the others are cancelled and the first error is
+    raised as is, just like awaiting them one after the other would.
+    """
+    try:
+        async with asyncio.TaskGroup() as tg:
+            tasks = [tg.create_task(aw) for aw in aws]  # type: ignore
+    except BaseExceptionGroup as e:
+        raise e.exceptions[0] from None
+
+    return [t.result() for t in tasks]
@@ -28,6 +28,9 @@ setup(
         "aiohttp",
         "pytz",
     ],
+    extras_require={
+        "speedups": ["orjson"],
+    },
     python_requires=">=3.11",
     **kwargs
 )